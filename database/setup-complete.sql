@@ -595,6 +595,14 @@ CREATE INDEX IF NOT EXISTS idx_supplier_transactions_material ON public.supplier
 CREATE INDEX IF NOT EXISTS idx_activity_log_timestamp ON public.activity_log(timestamp);
 CREATE INDEX IF NOT EXISTS idx_activity_log_user_id ON public.activity_log(user_id);
 
+-- Incremental sync and replication page through rows after a (timestamp, id) mark
+CREATE INDEX IF NOT EXISTS idx_users_updated_at_id ON public.users(updated_at, id);
+CREATE INDEX IF NOT EXISTS idx_daily_rates_created_at_id ON public.daily_rates(created_at, id);
+CREATE INDEX IF NOT EXISTS idx_expense_log_created_at_id ON public.expense_log(created_at, id);
+CREATE INDEX IF NOT EXISTS idx_sales_log_created_at_id ON public.sales_log(created_at, id);
+CREATE INDEX IF NOT EXISTS idx_supplier_transactions_created_at_id ON public.supplier_transactions(created_at, id);
+CREATE INDEX IF NOT EXISTS idx_activity_log_created_at_id ON public.activity_log(created_at, id);
+
 -- ============================================================================
 -- STEP 6: INSERT DEFAULT JWT CONFIGURATION
 -- ============================================================================
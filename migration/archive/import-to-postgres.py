@@ -5,10 +5,19 @@ Imports exported SQL data directly to PostgreSQL without requiring psql command
 """
 
 import os
+import re
 import sys
+import gzip
 import psycopg2
 from datetime import datetime
 
+# sql_loader.py lives in migration/, one level up
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from sql_loader import (ImportStats, is_copy_export, load_sql_file, load_copy_file, load_ndjson_file,
+                        table_export_files, export_file_name, INSERT_BATCH_SIZE, COPY_BATCH_SIZE)
+from chunk_store import manifest_chunks
+from export_manifest import ExportManifest, file_sha256
+
 # ANSI color codes
 class Colors:
     BLUE = '\033[0;34m'
@@ -46,8 +55,9 @@ try:
             line = line.strip()
             if line and not line.startswith('#') and '=' in line:
                 key, value = line.split('=', 1)
-                # Remove quotes if present
-                value = value.strip().strip('"').strip("'")
+                # A quoted value ends at its closing quote; otherwise " #" starts a comment
+                quoted = re.match(r"""(["'])(.*?)\1\s*(#.*)?$""", value.strip())
+                value = quoted.group(2) if quoted else re.split(r'\s+#', value.strip(), 1)[0]
                 config[key] = value
     print_success("Configuration loaded")
 except FileNotFoundError:
@@ -64,10 +74,23 @@ TARGET_PASSWORD = config.get('TARGET_PASSWORD')
 # Tables to import
 TABLES = config.get('TABLES', '').split(',')
 
+def get_option(name, default=None):
+    """Read a --name=value (or --name value) option from the command line"""
+    flag = f"--{name}"
+    for i, arg in enumerate(sys.argv):
+        if arg.startswith(flag + '='):
+            return arg.split('=', 1)[1]
+        if arg == flag and i + 1 < len(sys.argv):
+            return sys.argv[i + 1]
+    return default
+
 # Get export directory
 if os.path.exists('migration/.last_export'):
     with open('migration/.last_export', 'r') as f:
         EXPORT_DIR = f.read().strip()
+    # A --store export is recorded by its manifest.json
+    if os.path.basename(EXPORT_DIR) == 'manifest.json':
+        EXPORT_DIR = os.path.dirname(EXPORT_DIR)
 else:
     print_error("No export found. Please run export first.")
     print_info("Run: python migration/migrate-api.py export")
@@ -119,11 +142,14 @@ def get_row_count(conn, table):
         return 0
 
 def truncate_table(conn, table):
-    """Truncate a table"""
+    """Truncate a table in the transaction the import then runs in
+
+    The truncate is only committed together with the new rows, so a failed
+    import leaves the existing data in place.
+    """
     try:
         cursor = conn.cursor()
         cursor.execute(f"TRUNCATE TABLE {table} CASCADE;")
-        conn.commit()
         cursor.close()
         return True
     except Exception as e:
@@ -131,42 +157,110 @@ def truncate_table(conn, table):
         conn.rollback()
         return False
 
-def import_sql_file(conn, table, sql_file):
-    """Import SQL file into database"""
+def report_errors(stats):
+    """Print the first rejected rows' errors and how many were rejected"""
+    for error in stats.errors:  # Only the first few are kept
+        print_warning(f"    SQL error: {error[:100]}")
+    if stats.failed > 0:
+        print_warning(f"    {stats.failed} rows had errors (might be expected for duplicates)")
+
+def import_sql_file(conn, table, sql_file, stats, batch_size=INSERT_BATCH_SIZE):
+    """Import an INSERT-format export in batches, in the table's open transaction"""
     try:
-        # Read SQL file
-        with open(sql_file, 'r', encoding='utf-8') as f:
-            sql_content = f.read()
+        cursor = conn.cursor()
+        with open(sql_file, 'r', encoding='utf-8', newline='') as f:
+            load_sql_file(cursor, f, stats, batch_size)
+        cursor.close()
+        report_errors(stats)
+
+        return stats.rows > 0
 
-        # Split by semicolon to execute one statement at a time
-        statements = [s.strip() for s in sql_content.split(';') if s.strip()]
+    except Exception as e:
+        print_error(f"Failed to import {sql_file}: {e}")
+        return False
 
+def import_copy_file(conn, table, sql_file, stats, batch_size=COPY_BATCH_SIZE):
+    """Stream a COPY-format export into the database in batches, in the table's open transaction"""
+    try:
         cursor = conn.cursor()
-        success_count = 0
-        error_count = 0
+        with open(sql_file, 'r', encoding='utf-8', newline='') as f:
+            load_copy_file(cursor, f, stats, batch_size)
 
-        for statement in statements:
-            if statement:
-                try:
-                    cursor.execute(statement)
-                    success_count += 1
-                except Exception as e:
-                    error_count += 1
-                    if error_count <= 3:  # Only show first 3 errors
-                        print_warning(f"    SQL error: {str(e)[:100]}")
-
-        conn.commit()
+        print_info(f"    Copied {stats.rows} rows")
         cursor.close()
+        report_errors(stats)
+
+        return stats.rows > 0
+
+    except Exception as e:
+        print_error(f"Failed to import {sql_file}: {e}")
+        return False
+
+def import_ndjson_file(conn, table, ndjson_file, stats, batch_size=COPY_BATCH_SIZE):
+    """Copy an ndjson export (--format=ndjson) into the database, in the table's open transaction"""
+    try:
+        cursor = conn.cursor()
+        with gzip.open(ndjson_file, 'rt', encoding='utf-8', newline='') as f:
+            load_ndjson_file(cursor, f, stats, batch_size)
 
-        if error_count > 0:
-            print_warning(f"    {error_count} statements had errors (might be expected for duplicates)")
+        print_info(f"    Copied {stats.rows} rows")
+        cursor.close()
+        report_errors(stats)
 
-        return success_count > 0
+        return stats.rows > 0
 
     except Exception as e:
+        print_error(f"Failed to import {ndjson_file}: {e}")
+        return False
+
+def import_file(conn, table, sql_file, stats, batch_size=0):
+    """Import one export file of any format; batch_size 0 means the format's default"""
+    if sql_file.endswith('.ndjson.gz'):
+        return import_ndjson_file(conn, table, sql_file, stats, batch_size or COPY_BATCH_SIZE)
+    try:
+        copy_format = is_copy_export(sql_file)
+    except OSError as e:
         print_error(f"Failed to import {sql_file}: {e}")
-        conn.rollback()
         return False
+    if copy_format:
+        return import_copy_file(conn, table, sql_file, stats, batch_size or COPY_BATCH_SIZE)
+    return import_sql_file(conn, table, sql_file, stats, batch_size or INSERT_BATCH_SIZE)
+
+def table_files_with_sha256(table):
+    """(path, SHA-256 recorded in the manifest or None) of a table's export files, in order
+
+    <table>.sql, <table>.ndjson.gz, the shards of either, or the chunks of a
+    --store export. Exports without a manifest have nothing to check against.
+    """
+    manifest = ExportManifest.load(EXPORT_DIR)
+    if manifest is not None and manifest.store:
+        return manifest_chunks(manifest, table)
+
+    paths = table_export_files(EXPORT_DIR, table)
+    if manifest is None:
+        return [(path, None) for path in paths]
+    entry = manifest.table(table)
+    if entry.get('shards'):
+        count = len(entry['shards'])
+        recorded = {export_file_name(table, manifest.format, (index, count)): shard.get('sha256')
+                    for index, shard in enumerate(entry['shards'])}
+    else:
+        recorded = {export_file_name(table, manifest.format): entry.get('sha256')}
+    return [(path, recorded.get(os.path.basename(path))) for path in paths]
+
+def corrupt_files(table_files):
+    """The files whose contents no longer match their recorded SHA-256"""
+    return [path for path, sha256 in table_files if sha256 and file_sha256(path) != sha256]
+
+def print_import_report(results):
+    """Throughput and round trips per table, for comparing batch sizes"""
+    print()
+    print(f"{'TABLE':<20} | {'ROWS':>8} | {'FAILED':>6} | {'SECONDS':>8} | {'ROWS/SEC':>9} | {'TRIPS/10K':>9}")
+    print("-" * 75)
+    for stats in results:
+        print(f"{stats.table:<20} | {stats.rows:>8} | {stats.failed:>6} | {stats.seconds:>8.2f} | "
+              f"{stats.rows_per_second:>9.0f} | {stats.round_trips_per_10k:>9.1f}")
+    print()
 
 def main():
     print_header("PostgreSQL Direct Import Tool")
@@ -178,20 +272,43 @@ def main():
         print_warning("Force mode: Will automatically clear existing data")
         print()
 
+    try:
+        batch_size = int(get_option('batch-size', '0'))
+    except ValueError:
+        print_error("--batch-size must be a whole number")
+        sys.exit(1)
+
     # Test connection
     print_info("Testing database connection...")
     conn = connect_db()
     print_success("Database connection successful")
     print()
 
+    # Every file is checked before any table is touched: truncating one
+    # table cascades to the tables that reference it
+    print_info("Checking export files against the manifest...")
+    export_files = {table.strip(): table_files_with_sha256(table.strip()) for table in TABLES}
+    corrupt = [path for table_files in export_files.values() for path in corrupt_files(table_files)]
+    if corrupt:
+        for path in corrupt:
+            print_error(f"{path} does not match its checksum in the manifest")
+        print_error("Nothing was imported")
+        sys.exit(1)
+    print_success("Export files match their checksums")
+    print()
+
     print_header("STEP 1: Importing Data to PostgreSQL")
 
+    results = []
+    # Tables left without their export's rows
+    failed = []
+
     for table in TABLES:
         table = table.strip()
-        sql_file = os.path.join(EXPORT_DIR, f"{table}.sql")
-
-        if not os.path.exists(sql_file):
+        table_files = export_files[table]
+        if not table_files:
             print_warning(f"Export file not found for {table}, skipping")
+            failed.append(table)
             continue
 
         print_info(f"Processing table: {table}")
@@ -207,6 +324,7 @@ def main():
                 print_info("  Clearing existing data (force mode)...")
                 if not truncate_table(conn, table):
                     print_error(f"  Skipping import for {table}")
+                    failed.append(table)
                     continue
             else:
                 try:
@@ -215,6 +333,7 @@ def main():
                         print_info("  Clearing existing data...")
                         if not truncate_table(conn, table):
                             print_error(f"  Skipping import for {table}")
+                            failed.append(table)
                             continue
                     else:
                         print_info("  Keeping existing data, appending new data...")
@@ -223,23 +342,48 @@ def main():
                     print_info("  Non-interactive mode detected, clearing data by default...")
                     if not truncate_table(conn, table):
                         print_error(f"  Skipping import for {table}")
+                        failed.append(table)
                         continue
 
-        # Import data
-        print_info(f"  Importing data from {table}.sql...")
-        if import_sql_file(conn, table, sql_file):
+        # Import data: the truncate and every file commit together, or not at all
+        stats = ImportStats(table)
+        imported = True
+        for sql_file, _ in table_files:
+            print_info(f"  Importing data from {os.path.basename(sql_file)}...")
+            if not import_file(conn, table, sql_file, stats, batch_size):
+                imported = False
+                break
+
+        if imported:
+            try:
+                conn.commit()
+                stats.round_trips += 1
+            except Exception as e:
+                print_error(f"  Failed to commit {table}: {e}")
+                imported = False
+        if not imported:
+            conn.rollback()
+        stats.finish()
+
+        if imported:
+            results.append(stats)
             # Get new row count
             new_count = get_row_count(conn, table)
             print_success("  Import successful")
             print(f"  New row count: {new_count}")
         else:
-            print_error("  Import failed")
+            print_error("  Import failed; the table was left as it was")
+            failed.append(table)
 
         print()
 
     # Close connection
     conn.close()
 
+    if results:
+        print_header("Import Throughput")
+        print_import_report(results)
+
     print_header("STEP 2: Verifying Data")
 
     # Reconnect for verification
@@ -274,6 +418,10 @@ def main():
     print("  activity_log:  1000")
     print()
 
+    if failed:
+        print_error(f"Not imported: {', '.join(failed)}")
+        sys.exit(1)
+
 if __name__ == "__main__":
     try:
         main()
@@ -0,0 +1,1640 @@
+#!/usr/bin/env python3
+"""
+Migration Benchmark Tool
+Measures throughput and memory use of the migration scripts on synthetic data
+
+Every benchmark runs inside a throwaway working directory with its own
+config.env, so it never touches migration/config.env, migration/exports or
+migration/.last_export.
+"""
+
+import io
+import json
+import os
+import sys
+import time
+import uuid
+import random
+import shutil
+import socket
+import resource
+import threading
+import tempfile
+import subprocess
+import contextlib
+import statistics
+import tracemalloc
+import importlib.util
+import urllib.request
+from datetime import datetime, timedelta
+
+# ANSI color codes
+class Colors:
+    BLUE = '\033[0;34m'
+    GREEN = '\033[0;32m'
+    RED = '\033[0;31m'
+    YELLOW = '\033[1;33m'
+    NC = '\033[0m'  # No Color
+
+def print_header(text):
+    print(f"\n{Colors.BLUE}{'='*50}")
+    print(text)
+    print(f"{'='*50}{Colors.NC}\n")
+
+def print_success(text):
+    print(f"{Colors.GREEN}[OK] {text}{Colors.NC}")
+
+def print_error(text):
+    print(f"{Colors.RED}[ERROR] {text}{Colors.NC}")
+
+def print_info(text):
+    print(f"{Colors.BLUE}[INFO] {text}{Colors.NC}")
+
+MIGRATION_DIR = os.path.dirname(os.path.abspath(__file__))
+SCHEMA_FILE = os.path.join(os.path.dirname(MIGRATION_DIR), 'database', 'setup-complete.sql')
+
+# Scratch database for load benchmarks; never point this at production
+BENCH_DSN = os.environ.get('BENCH_DSN', 'host=localhost port=5432 dbname=karat_bench user=postgres')
+
+BENCH_CONFIG = {
+    'SOURCE_PROJECT_ID': 'benchmark',
+    'TARGET_HOST': 'localhost',
+    'TARGET_PORT': '5432',
+    'TARGET_DB_NAME': 'karat_bench',
+    'TARGET_USER': 'postgres',
+    'TARGET_PASSWORD': '',
+    'TABLES': 'sales_log',
+}
+
+# ============================================
+# Synthetic data
+# ============================================
+
+def synthetic_sales_row(rnd, day):
+    """One sales_log row shaped like the production table"""
+    weight = round(rnd.uniform(1, 80), 3)
+    purity = round(rnd.uniform(75, 92), 2)
+    cost = round(weight * rnd.uniform(5000, 7000), 2)
+    return {
+        'id': str(uuid.UUID(int=rnd.getrandbits(128))),
+        'inserted_by': rnd.choice(['admin', 'owner', 'staff1']),
+        'date_time': f"{day.isoformat()}T10:15:00+00:00",
+        'asof_date': day.isoformat(),
+        'material': rnd.choice(['gold', 'silver']),
+        'type': rnd.choice(['wholesale', 'retail']),
+        'item_name': rnd.choice(["Chain", "Ring; 22K", "Bangle 'Classic'", "Anklet"]),
+        'tag_no': f"T{rnd.randint(1000, 99999)}",
+        'customer_name': rnd.choice(['Ravi', "D'Souza", 'Meena']),
+        'customer_phone': f"98{rnd.randint(10000000, 99999999)}",
+        'old_weight_grams': None,
+        'old_purchase_purity': None,
+        'o2_gram': None,
+        'old_sales_purity': None,
+        'old_material_profit': None,
+        'purchase_weight_grams': weight,
+        'purchase_purity': purity,
+        'purchase_cost': cost,
+        'selling_purity': round(purity + 2, 2),
+        'wastage': round(rnd.uniform(0, 12), 2),
+        'selling_cost': round(cost * 1.08, 2),
+        'profit': round(cost * 0.08, 2),
+        'created_at': f"{day.isoformat()}T10:15:00+00:00",
+    }
+
+def synthetic_pages(total_rows, page_size=1000, seed=42):
+    """Yield synthetic sales_log pages without holding more than one page"""
+    rnd = random.Random(seed)
+    start = datetime(2024, 1, 1).date()
+    produced = 0
+    while produced < total_rows:
+        size = min(page_size, total_rows - produced)
+        yield [synthetic_sales_row(rnd, start + timedelta(days=(produced + i) // 50))
+               for i in range(size)]
+        produced += size
+
+def synthetic_activity_row(rnd, moment):
+    """One activity_log row shaped like the production table"""
+    action = rnd.choice(['INSERT', 'UPDATE', 'DELETE'])
+    record = {'item_name': rnd.choice(["Chain", "Ring; 22K", "Bangle 'Classic'"]),
+              'selling_cost': round(rnd.uniform(1000, 500000), 2)}
+    return {
+        'id': str(uuid.UUID(int=rnd.getrandbits(128))),
+        'user_id': rnd.choice(['admin', 'owner', 'staff1']),
+        'table_name': rnd.choice(['sales_log', 'expense_log', 'daily_rates']),
+        'action': action,
+        'record_id': str(uuid.UUID(int=rnd.getrandbits(128))),
+        'old_data': None if action == 'INSERT' else record,
+        'new_data': None if action == 'DELETE' else record,
+        'timestamp': moment.isoformat() + '+00:00',
+        'ip_address': f"10.0.{rnd.randint(0, 255)}.{rnd.randint(1, 254)}",
+        'user_agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) Chrome/120.0',
+        'created_at': moment.isoformat() + '+00:00',
+    }
+
+def synthetic_activity_pages(total_rows, page_size=1000, seed=42, seconds_apart=7):
+    """Yield synthetic activity_log pages, rows seconds_apart seconds apart in time"""
+    rnd = random.Random(seed)
+    start = datetime(2024, 1, 1, 9, 0, 0)
+    produced = 0
+    while produced < total_rows:
+        size = min(page_size, total_rows - produced)
+        yield [synthetic_activity_row(rnd, start + timedelta(seconds=(produced + i) * seconds_apart))
+               for i in range(size)]
+        produced += size
+
+SYNTHETIC_USERS = ['admin', 'owner', 'staff1']
+
+def synthetic_user_rows():
+    """The users every synthetic row refers to, as inserted_by or user_id"""
+    return [{
+        'id': str(uuid.UUID(int=i + 1)),
+        'username': username,
+        'password': 'benchmark',
+        'sessionid': None,
+        'role': {'staff1': 'employee'}.get(username, username),
+        'created_at': '2024-01-01T00:00:00+00:00',
+        'updated_at': '2024-01-01T00:00:00+00:00',
+    } for i, username in enumerate(SYNTHETIC_USERS)]
+
+def synthetic_expense_row(rnd, day):
+    """One expense_log row shaped like the production table"""
+    return {
+        'id': str(uuid.UUID(int=rnd.getrandbits(128))),
+        'inserted_by': rnd.choice(SYNTHETIC_USERS),
+        'date_time': f"{day.isoformat()}T18:00:00+00:00",
+        'asof_date': day.isoformat(),
+        'expense_type': rnd.choice(['direct', 'indirect']),
+        'item_name': rnd.choice(['Tea; snacks', "Polisher's fee", 'Electricity']),
+        'cost': round(rnd.uniform(10, 5000), 2),
+        'is_credit': rnd.random() < 0.2,
+        'created_at': f"{day.isoformat()}T18:00:00+00:00",
+    }
+
+def synthetic_rate_row(rnd, day):
+    """One daily_rates row shaped like the production table"""
+    price = round(rnd.uniform(5500, 7500), 2)
+    return {
+        'id': str(uuid.UUID(int=rnd.getrandbits(128))),
+        'inserted_by': rnd.choice(SYNTHETIC_USERS[:2]),
+        'date_time': f"{day.isoformat()}T09:00:00+00:00",
+        'asof_date': day.isoformat(),
+        'material': rnd.choice(['gold', 'silver']),
+        'karat': rnd.choice(['24K', '22K', '18K']),
+        'new_price_per_gram': price,
+        'old_price_per_gram': round(price * 0.97, 2),
+        'created_at': f"{day.isoformat()}T09:00:00+00:00",
+    }
+
+def synthetic_supplier_row(rnd, day):
+    """One supplier_transactions row shaped like the production table"""
+    value = round(rnd.uniform(1, 500), 3)
+    return {
+        'id': str(uuid.UUID(int=rnd.getrandbits(128))),
+        'inserted_by': rnd.choice(SYNTHETIC_USERS),
+        'date_time': f"{day.isoformat()}T14:30:00+00:00",
+        'asof_date': day.isoformat(),
+        'supplier_name': rnd.choice(['Sri Lakshmi Gold', "Kumar & Sons", 'Metro Bullion']),
+        'material': rnd.choice(['gold', 'silver']),
+        'type': rnd.choice(['input', 'output']),
+        'calculation_type': rnd.choice(['cashToKacha', 'kachaToPurity', 'ornamentToPurity']),
+        'input_value_1': value,
+        'input_value_2': round(rnd.uniform(75, 99.9), 3),
+        'result': round(value * 0.9, 3),
+        'is_credit': rnd.random() < 0.1,
+        'created_at': f"{day.isoformat()}T14:30:00+00:00",
+    }
+
+def synthetic_tables(rows, seed=42):
+    """Every migrated table with the given number of rows (users: 3)"""
+    rnd = random.Random(seed)
+    start = datetime(2024, 1, 1).date()
+
+    def daily(make_row):
+        return [make_row(rnd, start + timedelta(days=i // 20)) for i in range(rows)]
+
+    return {
+        'users': synthetic_user_rows(),
+        'daily_rates': daily(synthetic_rate_row),
+        'expense_log': daily(synthetic_expense_row),
+        'sales_log': [row for page in synthetic_pages(rows, seed=seed) for row in page],
+        'supplier_transactions': daily(synthetic_supplier_row),
+        'activity_log': [row for page in synthetic_activity_pages(rows, seed=seed) for row in page],
+    }
+
+# sales_log without the users foreign key, so benchmarks need no seed data
+SALES_LOG_DDL = """
+CREATE TEMP TABLE {name} (
+    id UUID PRIMARY KEY,
+    inserted_by TEXT NOT NULL,
+    date_time TIMESTAMP WITH TIME ZONE,
+    asof_date DATE NOT NULL,
+    material TEXT NOT NULL,
+    type TEXT NOT NULL,
+    item_name TEXT NOT NULL,
+    tag_no TEXT NOT NULL,
+    customer_name TEXT NOT NULL,
+    customer_phone TEXT NOT NULL,
+    old_weight_grams DECIMAL(10,3),
+    old_purchase_purity DECIMAL(5,2),
+    o2_gram DECIMAL(10,3),
+    old_sales_purity DECIMAL(5,2),
+    old_material_profit DECIMAL(10,2),
+    purchase_weight_grams DECIMAL(10,3) NOT NULL,
+    purchase_purity DECIMAL(5,2) NOT NULL,
+    purchase_cost DECIMAL(10,2) NOT NULL,
+    selling_purity DECIMAL(5,2),
+    wastage DECIMAL(5,2),
+    selling_cost DECIMAL(10,2) NOT NULL,
+    profit DECIMAL(10,2) NOT NULL,
+    created_at TIMESTAMP WITH TIME ZONE
+)
+"""
+
+# sales_log column types as get_table_schema() reports them
+SALES_LOG_TYPES = {
+    'id': 'uuid', 'inserted_by': 'text', 'date_time': 'timestamp with time zone',
+    'asof_date': 'date', 'material': 'text', 'type': 'text', 'item_name': 'text',
+    'tag_no': 'text', 'customer_name': 'text', 'customer_phone': 'text',
+    'old_weight_grams': 'numeric', 'old_purchase_purity': 'numeric', 'o2_gram': 'numeric',
+    'old_sales_purity': 'numeric', 'old_material_profit': 'numeric',
+    'purchase_weight_grams': 'numeric', 'purchase_purity': 'numeric', 'purchase_cost': 'numeric',
+    'selling_purity': 'numeric', 'wastage': 'numeric', 'selling_cost': 'numeric',
+    'profit': 'numeric', 'created_at': 'timestamp with time zone',
+}
+
+# activity_log with the foreign key and indexes of database/setup-complete.sql.
+# Regular tables, since migrate-api.py loads them over its own connections
+ACTIVITY_LOG_DDL = """
+CREATE TABLE bench_users (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    username TEXT UNIQUE NOT NULL
+);
+INSERT INTO bench_users (username) VALUES ('admin'), ('owner'), ('staff1');
+CREATE TABLE bench_activity_log (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    user_id TEXT NOT NULL REFERENCES bench_users(username),
+    table_name TEXT NOT NULL,
+    action TEXT NOT NULL CHECK (action IN ('INSERT', 'UPDATE', 'DELETE')),
+    record_id UUID,
+    old_data JSONB,
+    new_data JSONB,
+    timestamp TIMESTAMP WITH TIME ZONE DEFAULT now(),
+    ip_address INET,
+    user_agent TEXT,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT now()
+);
+CREATE INDEX idx_bench_activity_log_timestamp ON bench_activity_log(timestamp);
+CREATE INDEX idx_bench_activity_log_user_id ON bench_activity_log(user_id);
+"""
+
+# ============================================
+# Harness helpers
+# ============================================
+
+@contextlib.contextmanager
+def bench_workspace(config=None):
+    """Run inside a temporary directory laid out like the repo root"""
+    old_cwd = os.getcwd()
+    workdir = tempfile.mkdtemp(prefix='karat_bench_')
+    try:
+        os.makedirs(os.path.join(workdir, 'migration'))
+        with open(os.path.join(workdir, 'migration', 'config.env'), 'w') as f:
+            for key, value in {**BENCH_CONFIG, **(config or {})}.items():
+                f.write(f'{key}="{value}"\n')
+        os.chdir(workdir)
+        yield workdir
+    finally:
+        os.chdir(old_cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def pg_tool(name):
+    """Path of a PostgreSQL server binary, from PG_BIN or the PATH"""
+    pg_bin = os.environ.get('PG_BIN')
+    path = os.path.join(pg_bin, name) if pg_bin else shutil.which(name)
+    if not path or not os.path.exists(path):
+        print_error(f"{name} not found; install PostgreSQL or set PG_BIN to its bin directory")
+        sys.exit(1)
+    return path
+
+def create_schema_database(port, dbname):
+    """Create a database on a disposable cluster and load setup-complete.sql into it"""
+    psql = [pg_tool('psql'), '-h', 'localhost', '-p', str(port), '-U', 'postgres', '-q']
+    subprocess.run(psql + ['-d', 'postgres', '-c', f'CREATE DATABASE {dbname}'],
+                   check=True, capture_output=True)
+    # Optional extensions (pgjwt) are missing on a plain server; the
+    # script carries on past them, as it does on a fresh install
+    result = subprocess.run(psql + ['-d', dbname, '-f', SCHEMA_FILE], capture_output=True, text=True)
+    errors = [line for line in result.stderr.splitlines() if 'ERROR' in line]
+    if errors:
+        print_info(f"setup-complete.sql: {len(errors)} statements failed, first: {errors[0].strip()}")
+
+@contextlib.contextmanager
+def disposable_postgres(dbname='karat_bench_e2e'):
+    """Start a throwaway PostgreSQL cluster loaded from database/setup-complete.sql
+
+    Yields the TARGET_* settings for config.env. The cluster lives in a
+    temporary directory and is stopped and deleted afterwards. initdb
+    refuses to run as root, so run this as an ordinary user.
+    """
+    workdir = tempfile.mkdtemp(prefix='karat_pg_')
+    data_dir = os.path.join(workdir, 'data')
+    port = free_port()
+    started = False
+    try:
+        result = subprocess.run([pg_tool('initdb'), '-D', data_dir, '-U', 'postgres', '-A', 'trust'],
+                                capture_output=True, text=True)
+        if result.returncode != 0:
+            print_error(f"initdb failed: {result.stderr.strip()}")
+            sys.exit(1)
+
+        result = subprocess.run([pg_tool('pg_ctl'), '-D', data_dir, '-l', os.path.join(workdir, 'server.log'),
+                                 '-o', f"-p {port} -k {workdir} -c listen_addresses=localhost",
+                                 '-w', 'start'], capture_output=True, text=True)
+        if result.returncode != 0:
+            print_error(f"PostgreSQL did not start; see {workdir}/server.log")
+            sys.exit(1)
+        started = True
+
+        create_schema_database(port, dbname)
+        yield {
+            'TARGET_HOST': 'localhost',
+            'TARGET_PORT': str(port),
+            'TARGET_DB_NAME': dbname,
+            'TARGET_USER': 'postgres',
+            'TARGET_PASSWORD': '',
+        }
+    finally:
+        if started:
+            subprocess.run([pg_tool('pg_ctl'), '-D', data_dir, '-m', 'fast', '-w', 'stop'],
+                           capture_output=True)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+def child_peak_rss(pid):
+    """VmHWM of a running process in bytes, or None where /proc is unavailable"""
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+def run_with_rusage(args):
+    """Run a command to completion; return (exit code, seconds, peak RSS in bytes, output)
+
+    On Linux ru_maxrss of a spawned child starts from the parent's own peak
+    (the benchmark holds the synthetic tables), so the child's VmHWM is
+    sampled from /proc instead while it runs.
+    """
+    started = time.perf_counter()
+    process = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    chunks = []
+    reader = threading.Thread(target=lambda: chunks.append(process.stdout.read()), daemon=True)
+    reader.start()
+
+    sampled = None
+    while process.poll() is None:
+        peak = child_peak_rss(process.pid)
+        if peak is not None:
+            sampled = max(sampled or 0, peak)
+        time.sleep(0.05)
+    reader.join()
+    seconds = time.perf_counter() - started
+
+    if sampled is None:
+        # ru_maxrss is in kilobytes on Linux, bytes on macOS
+        usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+        sampled = usage.ru_maxrss if sys.platform == 'darwin' else usage.ru_maxrss * 1024
+    return process.returncode, seconds, sampled, ''.join(chunks)
+
+def load_migrate_api():
+    """Import migrate-api.py as a module (it reads config.env from the cwd)"""
+    spec = importlib.util.spec_from_file_location(
+        'migrate_api', os.path.join(MIGRATION_DIR, 'migrate-api.py'))
+    module = importlib.util.module_from_spec(spec)
+    with quiet():
+        spec.loader.exec_module(module)
+    return module
+
+@contextlib.contextmanager
+def quiet():
+    """Silence the progress output of the code under test"""
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+def measure(func):
+    """Run func and return (result, seconds, peak traced memory in bytes)"""
+    tracemalloc.start()
+    started = time.perf_counter()
+    try:
+        result = func()
+    finally:
+        elapsed = time.perf_counter() - started
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return result, elapsed, peak
+
+def format_mb(num_bytes):
+    return f"{num_bytes / (1024 * 1024):.1f} MB"
+
+def connect_bench_db():
+    """Connect to the scratch benchmark database, or exit with a hint"""
+    try:
+        import psycopg2
+    except ImportError:
+        print_error("psycopg2 is required for load benchmarks: pip install psycopg2-binary")
+        sys.exit(1)
+    try:
+        return psycopg2.connect(BENCH_DSN, connect_timeout=10)
+    except Exception as e:
+        print_error(f"Cannot connect to benchmark database ({BENCH_DSN}): {e}")
+        print_info("Set BENCH_DSN to a scratch PostgreSQL database")
+        sys.exit(1)
+
+# ============================================
+# Benchmarks
+# ============================================
+
+def bench_export_memory(sizes=(10000, 50000, 100000)):
+    """Peak memory of the streaming export versus buffering the whole table"""
+    print_header("Export memory: streaming vs buffered")
+
+    print(f"{'ROWS':>10} | {'STREAMING PEAK':>15} | {'BUFFERED PEAK':>15} | {'STREAM TIME':>12}")
+    print("-" * 65)
+
+    for rows in sizes:
+        with bench_workspace():
+            api = load_migrate_api()
+            api.iter_supabase_pages = lambda table, batch_size=1000, **kwargs: synthetic_pages(rows, batch_size)
+
+            with quiet():
+                _, stream_time, stream_peak = measure(api.export_data)
+
+            def buffered():
+                # What export_data used to do: whole table, then whole SQL text
+                data = api.fetch_supabase_data('sales_log')
+                return len(api.generate_insert_sql('sales_log', data))
+
+            with quiet():
+                _, _, buffered_peak = measure(buffered)
+
+        print(f"{rows:>10} | {format_mb(stream_peak):>15} | {format_mb(buffered_peak):>15} | {stream_time:>11.2f}s")
+
+    print()
+    print_success("Streaming peak should stay flat while buffered peak grows with row count")
+
+def legacy_insert_sql(table_name, data):
+    """generate_insert_sql as it was: isinstance and an f-string per cell"""
+    columns = list(data[0].keys())
+    sql_statements = []
+    for row in data:
+        values = []
+        for col in columns:
+            value = row[col]
+            if value is None:
+                values.append('NULL')
+            elif isinstance(value, bool):
+                values.append('TRUE' if value else 'FALSE')
+            elif isinstance(value, (int, float)):
+                values.append(str(value))
+            elif isinstance(value, dict):
+                values.append(f"'{json.dumps(value)}'::jsonb")
+            else:
+                escaped_value = str(value).replace("'", "''")
+                values.append(f"'{escaped_value}'")
+        columns_str = ', '.join(f'"{col}"' for col in columns)
+        values_str = ', '.join(values)
+        sql_statements.append(f"INSERT INTO {table_name} ({columns_str}) VALUES ({values_str});")
+    return '\n'.join(sql_statements)
+
+def bench_serialize(rows=100000, rounds=3):
+    """Rows per second turned into INSERT statements, old serializer vs new"""
+    print_header("INSERT serialization: per cell vs per column")
+
+    pages = list(synthetic_pages(rows))
+    with bench_workspace():
+        api = load_migrate_api()
+        serializers = {
+            'per cell (old)': lambda page: legacy_insert_sql('sales_log', page),
+            'per column, no schema': lambda page: api.generate_insert_sql('sales_log', page),
+            'per column, schema': lambda page: api.generate_insert_sql(
+                'sales_log', page, column_types=SALES_LOG_TYPES),
+        }
+
+        print(f"{'SERIALIZER':<24} | {'ROWS/S':>10} | {'SPEEDUP':>8}")
+        print("-" * 50)
+        baseline = None
+        for label, serialize in serializers.items():
+            best = None
+            for _ in range(rounds):
+                started = time.perf_counter()
+                for page in pages:
+                    serialize(page)
+                elapsed = time.perf_counter() - started
+                best = elapsed if best is None else min(best, elapsed)
+            rate = rows / best
+            baseline = baseline or rate
+            print(f"{label:<24} | {rate:>10,.0f} | {rate / baseline:>7.1f}x")
+
+        same = all(legacy_insert_sql('sales_log', page) ==
+                   api.generate_insert_sql('sales_log', page, column_types=SALES_LOG_TYPES)
+                   for page in pages[:5])
+    print()
+    if same:
+        print_success("Schema-driven output matches the old serializer on sales_log rows")
+    else:
+        print_error("Schema-driven output differs from the old serializer")
+    print()
+
+def bench_copy_vs_insert(sizes=(5000, 20000)):
+    """Load rate of the INSERT export format versus the COPY export format"""
+    print_header("Import: INSERT statements vs COPY")
+
+    conn = connect_bench_db()
+    table = 'bench_sales_log'
+
+    print(f"{'ROWS':>10} | {'INSERT ROWS/S':>14} | {'COPY ROWS/S':>14} | {'SPEEDUP':>8}")
+    print("-" * 58)
+
+    with bench_workspace():
+        api = load_migrate_api()
+
+        for rows in sizes:
+            data = [row for page in synthetic_pages(rows) for row in page]
+            columns = list(data[0].keys())
+            insert_statements = api.generate_insert_sql(table, data).split('\n')
+            copy_sql = api.generate_copy_header(table, columns).rstrip(';')
+            copy_data = api.generate_copy_rows(columns, data) + '\n'
+
+            cursor = conn.cursor()
+            cursor.execute(SALES_LOG_DDL.format(name=table))
+
+            # One statement per round trip, as import_sql_file does
+            started = time.perf_counter()
+            for statement in insert_statements:
+                cursor.execute(statement)
+            conn.commit()
+            insert_rate = rows / (time.perf_counter() - started)
+
+            cursor.execute(f"TRUNCATE {table}")
+            conn.commit()
+
+            started = time.perf_counter()
+            cursor.copy_expert(copy_sql, io.StringIO(copy_data))
+            conn.commit()
+            copy_rate = rows / (time.perf_counter() - started)
+
+            cursor.execute(f"DROP TABLE {table}")
+            conn.commit()
+            cursor.close()
+
+            print(f"{rows:>10} | {insert_rate:>14,.0f} | {copy_rate:>14,.0f} | {copy_rate / insert_rate:>7.1f}x")
+
+    conn.close()
+    print()
+
+def bench_keyset_vs_offset(rows=200000, page_size=1000, samples=5):
+    """Per-page latency deep into a table: offset paging versus keyset paging"""
+    from mock_postgrest import MockPostgREST
+
+    print_header("REST paging: offset vs keyset")
+    print_info(f"Generating {rows} synthetic sales_log rows...")
+    data = [row for page in synthetic_pages(rows, page_size) for row in page]
+    ids = sorted(row['id'] for row in data)
+
+    def timed_get(url):
+        latencies = []
+        for _ in range(samples):
+            started = time.perf_counter()
+            with urllib.request.urlopen(url, timeout=60) as response:
+                response.read()
+            latencies.append(time.perf_counter() - started)
+        return statistics.median(latencies) * 1000
+
+    with MockPostgREST({'sales_log': data}) as mock:
+        base = f"{mock.url}/rest/v1/sales_log?select=*&order=id.asc&limit={page_size}"
+
+        print()
+        print(f"{'PAGE AT ROW':>12} | {'OFFSET MS':>10} | {'KEYSET MS':>10}")
+        print("-" * 40)
+
+        for fraction in (0, 0.25, 0.5, 0.75, 0.99):
+            offset = int(rows * fraction) // page_size * page_size
+            offset_ms = timed_get(f"{base}&offset={offset}")
+            keyset_url = base if offset == 0 else f"{base}&id=gt.{ids[offset - 1]}"
+            keyset_ms = timed_get(keyset_url)
+            print(f"{offset:>12} | {offset_ms:>10.1f} | {keyset_ms:>10.1f}")
+
+    print()
+    print_success("Keyset latency should stay flat while offset latency grows with position")
+
+def bench_rest_client(rows=20000, requests=300):
+    """Per-request overhead of one urllib connection per request vs RestClient"""
+    from mock_postgrest import MockPostgREST
+    from rest_client import RestClient
+
+    print_header("REST client: urllib per request vs keep-alive + gzip")
+    data = [row for page in synthetic_pages(rows) for row in page]
+
+    with MockPostgREST({'sales_log': data}) as mock:
+        small = "/rest/v1/sales_log?select=id&order=id.asc&limit=1"
+        page = "/rest/v1/sales_log?select=*&order=id.asc&limit=1000"
+
+        def urllib_get(path, gzip_ok=False):
+            req = urllib.request.Request(mock.url + path)
+            if gzip_ok:
+                req.add_header('Accept-Encoding', 'gzip')
+            with urllib.request.urlopen(req, timeout=30) as response:
+                return response.read()
+
+        def per_request_ms(func):
+            started = time.perf_counter()
+            for _ in range(requests):
+                func()
+            return (time.perf_counter() - started) / requests * 1000
+
+        client = RestClient(mock.url)
+        urllib_ms = per_request_ms(lambda: urllib_get(small))
+        client_ms = per_request_ms(lambda: client.request('GET', small))
+        opened = client.connections_opened
+        client.close()
+
+        plain_bytes = len(urllib_get(page))
+        gzip_bytes = len(urllib_get(page, gzip_ok=True))
+
+    print(f"{'CLIENT':<28} | {'MS/REQUEST':>10} | {'CONNECTIONS':>11}")
+    print("-" * 56)
+    print(f"{'urllib (new connection)':<28} | {urllib_ms:>10.2f} | {requests:>11}")
+    print(f"{'RestClient (keep-alive)':<28} | {client_ms:>10.2f} | {opened:>11}")
+    print()
+    print(f"1000-row page on the wire: {plain_bytes:,} bytes plain, {gzip_bytes:,} bytes gzip "
+          f"({plain_bytes / gzip_bytes:.1f}x smaller)")
+    print_info("Loopback has no TLS; against Supabase each new connection also pays a TLS handshake")
+    print()
+
+def bench_flow_control(rows=100000, latency=0.02):
+    """Export page rate with fixed 1000-row pages vs adaptive flow control
+
+    Three sources: Supabase's 1000-row max-rows cap, a PostgREST without
+    one, and a rate-limited one that refuses more than two requests at once
+    with 429 and Retry-After while the export asks for four.
+    """
+    from mock_postgrest import MockPostgREST
+
+    print_header("REST flow control: fixed vs adaptive page size and concurrency")
+    data = [row for page in synthetic_pages(rows) for row in page]
+    expected_ids = sorted(row['id'] for row in data)
+
+    sources = [
+        ('max-rows 1000', {'max_rows': 1000}, 1),
+        ('no max-rows', {'max_rows': None}, 1),
+        ('2 requests at once', {'max_rows': None, 'max_concurrent': 2}, 4),
+    ]
+    settings = [
+        ('fixed', {'PAGE_SIZE_MAX': '1000'}),
+        ('adaptive', {}),
+    ]
+
+    print(f"{'SOURCE':<20} | {'PAGE SIZE':<9} | {'SECONDS':>8} | {'REQUESTS':>8} | {'429s':>5} | {'ROWS':>8}")
+    print("-" * 72)
+
+    for source, options, pipeline in sources:
+        for name, config in settings:
+            with MockPostgREST({'sales_log': data}, latency=latency, **options) as mock:
+                with bench_workspace({'SOURCE_URL': mock.url, **config}):
+                    api = load_migrate_api()
+                    started = time.perf_counter()
+                    with quiet():
+                        ids = [row['id'] for page in api.iter_supabase_pages('sales_log', pipeline=pipeline)
+                               for row in page]
+                    seconds = time.perf_counter() - started
+                    requests = api.metrics.tables['sales_log']['pages'] + mock.throttled
+            if sorted(ids) != expected_ids:
+                print_error(f"{source}, {name}: fetched {len(ids)} of {rows} rows")
+                sys.exit(1)
+            print(f"{source:<20} | {name:<9} | {seconds:>7.2f}s | {requests:>8} | "
+                  f"{mock.throttled:>5} | {len(ids):>8,}")
+
+    print()
+    print(f"{rows:,} sales_log rows, {latency * 1000:.0f}ms per request")
+    print()
+
+def bench_store(rows=100000, latency=0.005):
+    """Bytes written by repeated exports of sales_log, plain vs --store
+
+    Three exports each way: a first one, one of unchanged data, and one
+    after a single row in the last month was edited, as a nightly export
+    would see. Plain exports write a full directory every time; --store
+    exports write only chunks whose bytes are new.
+    """
+    from mock_postgrest import MockPostgREST
+    from chunk_store import ChunkStore
+
+    print_header("Repeated exports: plain directories vs --store chunks")
+    data = [row for page in synthetic_pages(rows) for row in page]
+    runs = ['first', 'unchanged', '1 row edited']
+
+    print(f"{'EXPORT':<7} | {'RUN':<13} | {'SECONDS':>8} | {'WRITTEN':>10} | {'ON DISK':>10} | {'CHUNKS':>13}")
+    print("-" * 76)
+
+    for name, store in (('plain', False), ('store', True)):
+        edited = dict(data[-1])
+        with MockPostgREST({'sales_log': data}, latency=latency) as mock:
+            with bench_workspace({'SOURCE_URL': mock.url, 'TABLES': 'sales_log'}):
+                on_disk = 0
+                for run in runs:
+                    if run == '1 row edited':
+                        edited['customer_name'] = 'Edited'
+                        mock.load_table('sales_log', data[:-1] + [edited])
+                    # Exports are named by the second; keep each run in its own directory
+                    time.sleep(1)
+                    api = load_migrate_api()
+                    started = time.perf_counter()
+                    with quiet():
+                        export_dir = api.export_data('copy', store=store)
+                    seconds = time.perf_counter() - started
+                    if export_dir is None:
+                        print_error(f"{name} export failed on the {run} run")
+                        sys.exit(1)
+
+                    manifest = api.ExportManifest.load(export_dir)
+                    entry = manifest.table('sales_log')
+                    if store:
+                        written = entry['new_bytes']
+                        disk = ChunkStore(manifest.store).size()
+                        stored = [chunk for chunk in entry['chunks'] if chunk['rows']]
+                        chunks = f"{sum(chunk['new'] for chunk in stored)} of {len(stored)} new"
+                    else:
+                        written = sum(os.path.getsize(os.path.join(export_dir, f))
+                                      for f in os.listdir(export_dir) if f.endswith('.sql'))
+                        on_disk += written
+                        disk = on_disk
+                        chunks = '-'
+                    if entry.get('rows') != rows:
+                        print_error(f"{name} export recorded {entry.get('rows')} of {rows} rows")
+                        sys.exit(1)
+                    print(f"{name:<7} | {run:<13} | {seconds:>7.2f}s | {format_mb(written):>10} | "
+                          f"{format_mb(disk):>10} | {chunks:>13}")
+
+    print()
+    print(f"{rows:,} sales_log rows over {rows // 50 // 30} months, COPY format, "
+          f"{latency * 1000:.0f}ms per request")
+    print_info("Plain WRITTEN includes all_tables.sql, a second copy of the table file")
+    print_info("The mock answers asof_date filters by scanning every row; Supabase uses idx_sales_log_asof_date")
+    print()
+
+def bench_fast_load(rows=1000000):
+    """Bulk load of activity_log with indexes and foreign keys live vs --fast-load"""
+    print_header("Import: live indexes vs --fast-load")
+
+    conn = connect_bench_db()
+    conn.autocommit = True
+    cursor = conn.cursor()
+    cursor.execute("DROP TABLE IF EXISTS bench_activity_log, bench_users")
+    cursor.execute(ACTIVITY_LOG_DDL)
+
+    info = conn.info
+    target = {
+        'TARGET_HOST': info.host,
+        'TARGET_PORT': str(info.port),
+        'TARGET_DB_NAME': info.dbname,
+        'TARGET_USER': info.user,
+        'TARGET_PASSWORD': info.password or '',
+    }
+    table = 'bench_activity_log'
+    results = {}
+
+    try:
+        with bench_workspace(target):
+            api = load_migrate_api()
+
+            print_info(f"Writing {rows:,} synthetic activity_log rows as a COPY export...")
+            table_file = os.path.abspath(f"{table}.sql")
+            columns = None
+            with open(table_file, 'w', encoding='utf-8') as f:
+                for page in synthetic_activity_pages(rows, 10000):
+                    if columns is None:
+                        columns = list(page[0].keys())
+                        f.write(api.generate_copy_header(table, columns) + '\n')
+                    else:
+                        f.write('\n')
+                    f.write(api.generate_copy_rows(columns, page))
+                f.write('\n\\.\n')
+
+            for label, fast_load in (('indexes live', False), ('--fast-load', True)):
+                cursor.execute(f"TRUNCATE {table}")
+                cursor.execute("CHECKPOINT")
+                with quiet():
+                    loaded, seconds, _ = measure(
+                        lambda: api.import_table(table, [table_file], None, fast_load))
+                if not loaded:
+                    print_error(f"Load failed in mode {label}")
+                    sys.exit(1)
+                results[label] = seconds
+
+        cursor.execute(f"SELECT COUNT(*) FROM {table}")
+        loaded_rows = cursor.fetchone()[0]
+        cursor.execute(f"SELECT COUNT(*) FROM pg_indexes WHERE tablename = '{table}'")
+        index_count = cursor.fetchone()[0]
+        cursor.execute(f"SELECT bool_and(convalidated) FROM pg_constraint "
+                       f"WHERE conrelid = '{table}'::regclass AND contype = 'f'")
+        fk_valid = cursor.fetchone()[0]
+    finally:
+        cursor.execute("DROP TABLE IF EXISTS bench_activity_log, bench_users")
+        conn.close()
+
+    print()
+    print(f"{'MODE':<14} | {'SECONDS':>8} | {'ROWS/S':>10}")
+    print("-" * 40)
+    for label, seconds in results.items():
+        print(f"{label:<14} | {seconds:>8.1f} | {rows / seconds:>10,.0f}")
+    print()
+    print(f"Speedup: {results['indexes live'] / results['--fast-load']:.1f}x")
+    if loaded_rows == rows and index_count == 3 and fk_valid:
+        print_success("After --fast-load: all rows present, 3 indexes rebuilt, foreign key validated")
+    else:
+        print_error(f"After --fast-load: {loaded_rows} rows, {index_count} indexes, foreign key valid={fk_valid}")
+    print()
+
+def bench_swap(rows=500000, read_interval=0.01):
+    """What readers of a live table see during import: TRUNCATE and load vs --swap
+
+    A reader thread counts bench_activity_log every read_interval seconds
+    while the same COPY export is imported over the table's existing rows,
+    once the default way and once with --swap.
+    """
+    import psycopg2
+
+    print_header("Import: TRUNCATE and load vs shadow table --swap")
+
+    conn = connect_bench_db()
+    conn.autocommit = True
+    cursor = conn.cursor()
+    cursor.execute("DROP TABLE IF EXISTS bench_activity_log, bench_users")
+    cursor.execute("DROP SCHEMA IF EXISTS import_shadow CASCADE; DROP SCHEMA IF EXISTS import_backup CASCADE")
+    cursor.execute(ACTIVITY_LOG_DDL)
+
+    info = conn.info
+    table = 'bench_activity_log'
+    target = {
+        'TARGET_HOST': info.host,
+        'TARGET_PORT': str(info.port),
+        'TARGET_DB_NAME': info.dbname,
+        'TARGET_USER': info.user,
+        'TARGET_PASSWORD': info.password or '',
+        'TABLES': table,
+    }
+    results = {}
+
+    def read_while(func):
+        """Run func while a second connection counts the table; returns (func's seconds, reads)"""
+        reads = []
+        done = threading.Event()
+
+        def reader():
+            reader_conn = psycopg2.connect(BENCH_DSN)
+            reader_conn.autocommit = True
+            with reader_conn.cursor() as reader_cursor:
+                while not done.is_set():
+                    started = time.perf_counter()
+                    reader_cursor.execute(f"SELECT COUNT(*) FROM {table}")
+                    reads.append((reader_cursor.fetchone()[0], time.perf_counter() - started))
+                    time.sleep(read_interval)
+            reader_conn.close()
+
+        thread = threading.Thread(target=reader)
+        thread.start()
+        try:
+            _, seconds, _ = measure(func)
+        finally:
+            done.set()
+            thread.join()
+        return seconds, reads
+
+    try:
+        with bench_workspace(target):
+            api = load_migrate_api()
+
+            print_info(f"Writing {rows:,} synthetic activity_log rows as a COPY export...")
+            export_dir = os.path.abspath('export')
+            os.makedirs(export_dir)
+            columns = None
+            with open(os.path.join(export_dir, f"{table}.sql"), 'w', encoding='utf-8') as f:
+                for page in synthetic_activity_pages(rows, 10000):
+                    if columns is None:
+                        columns = list(page[0].keys())
+                        f.write(api.generate_copy_header(table, columns) + '\n')
+                    else:
+                        f.write('\n')
+                    f.write(api.generate_copy_rows(columns, page))
+                f.write('\n\\.\n')
+
+            with quiet():
+                api.import_data(export_dir)
+            for label, swap in (('truncate + load', False), ('--swap', True)):
+                cursor.execute("CHECKPOINT")
+                with quiet():
+                    seconds, reads = read_while(lambda: api.import_data(export_dir, swap=swap))
+                cursor.execute(f"SELECT COUNT(*) FROM {table}")
+                if cursor.fetchone()[0] != rows:
+                    print_error(f"{label}: table does not have {rows} rows after the import")
+                    sys.exit(1)
+                results[label] = (seconds, reads)
+
+        cursor.execute(f"SELECT COUNT(*) FROM import_backup.{table}")
+        backup_rows = cursor.fetchone()[0]
+    finally:
+        cursor.execute("DROP TABLE IF EXISTS bench_activity_log, bench_users")
+        cursor.execute("DROP SCHEMA IF EXISTS import_shadow CASCADE; DROP SCHEMA IF EXISTS import_backup CASCADE")
+        conn.close()
+
+    print()
+    print(f"{'MODE':<16} | {'SECONDS':>8} | {'READS':>6} | {'SAW < ALL ROWS':>14} | {'MAX READ':>9}")
+    print("-" * 66)
+    for label, (seconds, reads) in results.items():
+        short = sum(1 for count, _ in reads if count < rows)
+        slowest = max(latency for _, latency in reads)
+        print(f"{label:<16} | {seconds:>8.1f} | {len(reads):>6} | {short:>14} | {slowest * 1000:>7.0f}ms")
+    print()
+    print(f"{rows:,} rows replaced; a read every {read_interval * 1000:.0f}ms")
+    if backup_rows == rows:
+        print_success(f"Replaced rows kept in import_backup.{table}")
+    else:
+        print_error(f"import_backup.{table} has {backup_rows} rows, expected {rows}")
+    print()
+
+def bench_partitions(rows=600000, months=24, queries=20):
+    """A plain activity_log vs one import --partition laid out by month, then archive
+
+    The same COPY export, spread over months months from January 2024, is
+    imported into a plain table and then with --partition. Each layout runs
+    a one-month GROUP BY queries times, and reports its biggest index (the
+    whole table's, or one partition's) and a VACUUM ANALYZE of the newest
+    month's rows: the whole table, or its partition. archive then moves all
+    but the newest six months out to compressed files.
+    """
+    print_header("Monthly partitions: date-range queries, index size, VACUUM and archive")
+
+    conn = connect_bench_db()
+    conn.autocommit = True
+    cursor = conn.cursor()
+    cursor.execute("DROP TABLE IF EXISTS bench_activity_log, bench_users")
+    cursor.execute("DROP SCHEMA IF EXISTS import_shadow CASCADE; DROP SCHEMA IF EXISTS import_backup CASCADE")
+    cursor.execute(ACTIVITY_LOG_DDL)
+
+    info = conn.info
+    table = 'bench_activity_log'
+    target = {
+        'TARGET_HOST': info.host,
+        'TARGET_PORT': str(info.port),
+        'TARGET_DB_NAME': info.dbname,
+        'TARGET_USER': info.user,
+        'TARGET_PASSWORD': info.password or '',
+        'TABLES': table,
+        'PARTITIONED_TABLES': f'{table}:timestamp',
+        'BACKUP_BEFORE_IMPORT': 'no',
+    }
+    seconds_apart = months * 30 * 86400 // rows
+    last_month = datetime(2024, 1, 1) + timedelta(seconds=rows * seconds_apart)
+    query_month = last_month.replace(day=1)
+    month_filter = (f"timestamp >= '{query_month:%Y-%m-%d}' "
+                    f"AND timestamp < '{(query_month + timedelta(days=32)).replace(day=1):%Y-%m-%d}'")
+    results = {}
+
+    def table_bytes(relation):
+        cursor.execute("SELECT COALESCE(sum(pg_total_relation_size(relid)), 0) FROM pg_partition_tree(%s)",
+                       (relation,))
+        return cursor.fetchone()[0]
+
+    def measure_layout(label):
+        cursor.execute(f"ANALYZE {table}")
+        started = time.perf_counter()
+        for _ in range(queries):
+            cursor.execute(f"SELECT action, COUNT(*) FROM {table} WHERE {month_filter} GROUP BY action")
+            cursor.fetchall()
+        query_seconds = (time.perf_counter() - started) / queries
+
+        cursor.execute(f"EXPLAIN SELECT COUNT(*) FROM {table} WHERE {month_filter}")
+        scanned = sum(1 for (line,) in cursor.fetchall() if ' on bench_activity_log' in line)
+
+        cursor.execute("SELECT max(pg_relation_size(i.indexrelid)) FROM pg_index i "
+                       "JOIN pg_class c ON c.oid = i.indrelid "
+                       "WHERE c.relname LIKE 'bench_activity_log%' AND c.relkind = 'r' "
+                       "AND c.relnamespace = 'public'::regnamespace")
+        largest_index = cursor.fetchone()[0]
+
+        cursor.execute(f"SELECT tableoid::regclass FROM {table} WHERE {month_filter} LIMIT 1")
+        newest = cursor.fetchone()[0]
+        cursor.execute(f"UPDATE {table} SET user_agent = 'vacuum' WHERE {month_filter}")
+        started = time.perf_counter()
+        cursor.execute(f"VACUUM ANALYZE {newest}")
+        vacuum_seconds = time.perf_counter() - started
+        results[label] = (query_seconds, scanned, largest_index, vacuum_seconds, newest)
+
+    try:
+        with bench_workspace(target):
+            api = load_migrate_api()
+
+            print_info(f"Writing {rows:,} synthetic activity_log rows over {months} months as a COPY export...")
+            export_dir = os.path.abspath('export')
+            os.makedirs(export_dir)
+            columns = None
+            with open(os.path.join(export_dir, f"{table}.sql"), 'w', encoding='utf-8') as f:
+                for page in synthetic_activity_pages(rows, 10000, seconds_apart=seconds_apart):
+                    if columns is None:
+                        columns = list(page[0].keys())
+                        f.write(api.generate_copy_header(table, columns) + '\n')
+                    else:
+                        f.write('\n')
+                    f.write(api.generate_copy_rows(columns, page))
+                f.write('\n\\.\n')
+
+            with quiet():
+                api.import_data(export_dir)
+            measure_layout('plain table')
+
+            with quiet():
+                _, import_seconds, _ = measure(lambda: api.import_data(export_dir, swap=True, partition=True))
+            cursor.execute(f"SELECT COUNT(*) FROM {table}")
+            if cursor.fetchone()[0] != rows:
+                print_error(f"--partition: table does not have {rows} rows after the import")
+                sys.exit(1)
+            cursor.execute(f"SELECT COUNT(*) FROM pg_partition_tree('{table}') WHERE isleaf")
+            partition_count = cursor.fetchone()[0]
+            measure_layout('--partition')
+
+            size_before = table_bytes(table)
+            keep = 6
+            current = datetime.now()
+            archive_after = (current.year - query_month.year) * 12 + current.month - query_month.month + keep - 1
+            api.ARCHIVE_DIR = os.path.abspath('archive')
+            with quiet():
+                archived, archive_seconds, _ = measure(lambda: api.archive_partitions(archive_after))
+            size_after = table_bytes(table)
+            cursor.execute(f"SELECT COUNT(*) FROM {table}")
+            rows_left = cursor.fetchone()[0]
+            archive_bytes = sum(os.path.getsize(os.path.join(directory, name))
+                                for directory, _, files in os.walk(api.ARCHIVE_DIR)
+                                for name in files if name.endswith('.gz'))
+    finally:
+        cursor.execute("DROP TABLE IF EXISTS bench_activity_log, bench_users")
+        cursor.execute("DROP SCHEMA IF EXISTS import_shadow CASCADE; DROP SCHEMA IF EXISTS import_backup CASCADE")
+        conn.close()
+
+    print()
+    print(f"{'LAYOUT':<12} | {'MONTH QUERY':>11} | {'TABLES SCANNED':>14} | {'LARGEST INDEX':>13} | "
+          f"{'VACUUM NEWEST':>13}")
+    print("-" * 78)
+    for label, (query_seconds, scanned, largest_index, vacuum_seconds, _) in results.items():
+        print(f"{label:<12} | {query_seconds * 1000:>9.1f}ms | {scanned:>14} | {format_mb(largest_index):>13} | "
+              f"{vacuum_seconds:>12.2f}s")
+    print()
+    print(f"{rows:,} rows over {months} months; --partition import took {import_seconds:.1f}s "
+          f"into {partition_count} partitions")
+    print(f"Query: one month ({query_month:%Y-%m}), {queries} runs; VACUUM ANALYZE of "
+          f"{results['plain table'][4]} vs {results['--partition'][4]} after updating that month")
+    if archived:
+        print_success(f"archive: {rows - rows_left:,} rows out in {archive_seconds:.1f}s, keeping {keep} months; "
+                      f"table {format_mb(size_before)} -> {format_mb(size_after)}, "
+                      f"archive files {format_mb(archive_bytes)}")
+    else:
+        print_error("archive did not complete")
+    print()
+
+def bench_payloads(rows=100000, latency=0.02, jobs=4):
+    """Time until activity_log is usable: select=* vs --defer-payloads, then the payloads pass
+
+    The mock serves activity_log rows whose old_data/new_data hold a whole
+    sales_log row, as the app logs them. The full run exports and imports
+    every column; the deferred run exports and imports the narrow columns,
+    then fills the payloads by id with jobs workers. Both end with the same
+    table, which is checked.
+    """
+    from mock_postgrest import MockPostgREST
+
+    print_header("Deferred payloads: time until activity_log is usable")
+
+    rnd = random.Random(7)
+    data = []
+    for page in synthetic_activity_pages(rows):
+        for row in page:
+            record = synthetic_sales_row(rnd, datetime(2024, 1, 1))
+            row['old_data'] = None if row['action'] == 'INSERT' else record
+            row['new_data'] = None if row['action'] == 'DELETE' else record
+            data.append(row)
+
+    conn = connect_bench_db()
+    conn.autocommit = True
+    cursor = conn.cursor()
+    cursor.execute("DROP TABLE IF EXISTS bench_activity_log, bench_users")
+    cursor.execute(ACTIVITY_LOG_DDL)
+
+    info = conn.info
+    table = 'bench_activity_log'
+    target = {
+        'TARGET_HOST': info.host,
+        'TARGET_PORT': str(info.port),
+        'TARGET_DB_NAME': info.dbname,
+        'TARGET_USER': info.user,
+        'TARGET_PASSWORD': info.password or '',
+        'TABLES': table,
+        # A column list lets the export leave the payloads out without reading the target's schema
+        f'SELECT_COLUMNS_{table}': ','.join(data[0].keys()),
+        f'DEFERRED_COLUMNS_{table}': 'old_data,new_data',
+    }
+    results = {}
+
+    def table_digest():
+        cursor.execute(f"SELECT md5(string_agg(t::text, '|' ORDER BY id)) FROM {table} t")
+        return cursor.fetchone()[0]
+
+    try:
+        with MockPostgREST({table: data}, latency=latency) as mock:
+            with bench_workspace({**target, 'SOURCE_URL': mock.url}):
+                for label, defer in (('select=*', False), ('--defer-payloads', True)):
+                    time.sleep(1)
+                    api = load_migrate_api()
+                    started = time.perf_counter()
+                    with quiet():
+                        export_dir = api.export_data('copy', pipeline=jobs, defer=defer)
+                        api.import_data(export_dir)
+                    usable = time.perf_counter() - started
+                    core_bytes = api.metrics.tables[table]['wire_bytes']
+                    file_bytes = os.path.getsize(os.path.join(export_dir, f"{table}.sql"))
+
+                    payload_seconds = 0.0
+                    if defer:
+                        started = time.perf_counter()
+                        with quiet():
+                            filled = api.fill_deferred_columns(jobs)
+                        payload_seconds = time.perf_counter() - started
+                        if not filled:
+                            print_error("payloads pass failed")
+                            sys.exit(1)
+                    results[label] = (usable, payload_seconds, core_bytes,
+                                      api.metrics.tables[table]['wire_bytes'], file_bytes, table_digest())
+    finally:
+        cursor.execute("DROP TABLE IF EXISTS bench_activity_log, bench_users")
+        conn.close()
+
+    print()
+    print(f"{'RUN':<17} | {'USABLE AFTER':>12} | {'PAYLOADS':>9} | {'TOTAL':>8} | {'CORE WIRE':>10} | "
+          f"{'ALL WIRE':>10} | {'EXPORT FILE':>11}")
+    print("-" * 97)
+    for label, (usable, payload_seconds, core_bytes, wire_bytes, file_bytes, _) in results.items():
+        print(f"{label:<17} | {usable:>11.2f}s | {payload_seconds:>8.2f}s | {usable + payload_seconds:>7.2f}s | "
+              f"{format_mb(core_bytes):>10} | {format_mb(wire_bytes):>10} | {format_mb(file_bytes):>11}")
+    print()
+    print(f"{rows:,} activity_log rows, COPY format, {jobs} pages in flight, {latency * 1000:.0f}ms per request; "
+          f"payloads in batches of {api.PAYLOAD_BATCH_SIZE} ids")
+    print_info("Wire bytes are the gzip-compressed responses")
+    if results['select=*'][5] == results['--defer-payloads'][5]:
+        print_success("Both runs end with identical tables")
+    else:
+        print_error("The deferred run's table differs from the full run's")
+        sys.exit(1)
+    print()
+
+def bench_shards(rows=200000, shard_counts=(1, 2, 4, 8), latency=0.1):
+    """Export and import of one big table split into 1, 2, 4 and 8 shards
+
+    migrate-api.py runs as a separate process, so the mock server's own
+    work does not compete with it for the interpreter. The default latency
+    is in line with a 1000-row activity_log page from a hosted project.
+    """
+    from mock_postgrest import MockPostgREST
+
+    print_header("One big table: --shards N --jobs N")
+
+    conn = connect_bench_db()
+    conn.autocommit = True
+    cursor = conn.cursor()
+    cursor.execute("DROP TABLE IF EXISTS bench_activity_log, bench_users")
+    cursor.execute(ACTIVITY_LOG_DDL)
+
+    info = conn.info
+    table = 'bench_activity_log'
+    config = {
+        'TARGET_HOST': info.host,
+        'TARGET_PORT': str(info.port),
+        'TARGET_DB_NAME': info.dbname,
+        'TARGET_USER': info.user,
+        'TARGET_PASSWORD': info.password or '',
+        'TABLES': table,
+        'SHARDED_TABLES': table,
+    }
+    source_rows = [row for page in synthetic_activity_pages(rows) for row in page]
+    script = os.path.join(MIGRATION_DIR, 'migrate-api.py')
+    results = {}
+
+    def run(*args):
+        code, seconds, _, output = run_with_rusage([sys.executable, script, *args])
+        if code != 0 or 'failed' in output.lower():
+            print(output[-2000:])
+            print_error(f"migrate-api.py {' '.join(args)} failed")
+            sys.exit(1)
+        return seconds
+
+    try:
+        with MockPostgREST({table: source_rows}, latency=latency) as mock:
+            config['SOURCE_URL'] = mock.url
+            for shards in shard_counts:
+                options = ['--jobs', str(shards), '--shards', str(shards)]
+                with bench_workspace(config):
+                    export_seconds = run('export', '--format=copy', *options)
+                    import_seconds = run('import', *options)
+                    fast_seconds = run('import', '--fast-load', *options)
+
+                cursor.execute(f"SELECT COUNT(*) FROM {table}")
+                loaded_rows = cursor.fetchone()[0]
+                if loaded_rows != rows:
+                    print_error(f"{shards} shards: {loaded_rows} of {rows} rows loaded")
+                    sys.exit(1)
+                results[shards] = (export_seconds, import_seconds, fast_seconds)
+    finally:
+        cursor.execute("DROP TABLE IF EXISTS bench_activity_log, bench_users")
+        conn.close()
+
+    print()
+    print(f"{'SHARDS':>6} | {'EXPORT':>8} | {'EXPORT ROWS/S':>13} | {'IMPORT':>8} | {'--fast-load':>11} | {'ROWS/S':>9}")
+    print("-" * 72)
+    for shards, (export_seconds, import_seconds, fast_seconds) in results.items():
+        print(f"{shards:>6} | {export_seconds:>7.2f}s | {rows / export_seconds:>13,.0f} | "
+              f"{import_seconds:>7.2f}s | {fast_seconds:>10.2f}s | {rows / fast_seconds:>9,.0f}")
+    print()
+    print(f"{rows:,} activity_log rows, {latency * 1000:.0f}ms per request, copy format, "
+          f"{os.cpu_count()} CPUs")
+    print()
+
+def bench_export_formats(rows=100000):
+    """File size, export time and load time of each export format"""
+    print_header("Export formats: insert vs copy vs ndjson")
+
+    conn = connect_bench_db()
+    conn.autocommit = True
+    cursor = conn.cursor()
+    table = 'bench_sales_log'
+    cursor.execute(f"DROP TABLE IF EXISTS {table}")
+    # A regular table, since import_table loads over its own pooled connection
+    cursor.execute(SALES_LOG_DDL.replace('TEMP ', '').format(name=table))
+
+    info = conn.info
+    target = {
+        'TARGET_HOST': info.host,
+        'TARGET_PORT': str(info.port),
+        'TARGET_DB_NAME': info.dbname,
+        'TARGET_USER': info.user,
+        'TARGET_PASSWORD': info.password or '',
+    }
+
+    print(f"{'FORMAT':<8} | {'FILE SIZE':>10} | {'EXPORT':>8} | {'LOAD':>8} | {'LOAD ROWS/S':>12}")
+    print("-" * 60)
+
+    try:
+        with bench_workspace(target) as workdir:
+            api = load_migrate_api()
+            api.iter_supabase_pages = lambda table, batch_size=1000, **kwargs: synthetic_pages(rows, batch_size)
+
+            for export_format in api.EXPORT_FORMATS:
+                export_dir = os.path.join(workdir, export_format)
+                os.makedirs(export_dir)
+                # Timed without measure(): tracemalloc would dominate the export
+                started = time.perf_counter()
+                with quiet():
+                    api.export_table(table, export_dir, export_format)
+                export_seconds = time.perf_counter() - started
+                table_file = os.path.join(export_dir, api.export_file_name(table, export_format))
+
+                cursor.execute(f"TRUNCATE {table}")
+                started = time.perf_counter()
+                with quiet():
+                    loaded = api.import_table(table, [table_file], None)
+                load_seconds = time.perf_counter() - started
+                if not loaded:
+                    print_error(f"Load failed for format {export_format}")
+                    sys.exit(1)
+
+                print(f"{export_format:<8} | {format_mb(os.path.getsize(table_file)):>10} | "
+                      f"{export_seconds:>7.2f}s | {load_seconds:>7.2f}s | {rows / load_seconds:>12,.0f}")
+    finally:
+        cursor.execute(f"DROP TABLE IF EXISTS {table}")
+        conn.close()
+    print()
+
+# Streams one export file in a child process, so its peak RSS is the reader's
+# alone. The cursor takes every batch and drops it: the point is the reader's
+# memory, not the server's speed.
+LARGE_EXPORT_LOADER = """
+import sys
+sys.path.insert(0, sys.argv[1])
+from sql_loader import ImportStats, load_export_file
+
+class DiscardingCursor:
+    def execute(self, sql):
+        pass
+
+    def copy_expert(self, sql, f, size=8192):
+        while f.read(size):
+            pass
+
+mode, path = sys.argv[2], sys.argv[3]
+stats = ImportStats('sales_log')
+if mode == 'read':
+    # What import-to-postgres.py used to do: whole file, then split on ';'
+    with open(path, 'r', encoding='utf-8') as f:
+        stats.rows = sum(1 for statement in f.read().split(';') if statement.strip())
+else:
+    load_export_file(DiscardingCursor(), path, stats)
+print(stats.rows)
+"""
+
+def write_large_export(path, size_bytes, block_rows=2000):
+    """Write an INSERT export of about size_bytes by repeating one block of rows; returns rows
+
+    Every tenth row carries a customer name with a newline, a semicolon and
+    a comment marker inside the quotes, the cases a naive split gets wrong.
+    """
+    rows = [row for page in synthetic_pages(block_rows) for row in page]
+    for row in rows[::10]:
+        row['customer_name'] = "Ravi\n-- Anna Nagar; branch 2"
+    block = legacy_insert_sql('sales_log', rows) + '\n'
+    written = 0
+    total_rows = 0
+    with open(path, 'w', encoding='utf-8') as f:
+        while written < size_bytes:
+            f.write(block)
+            written += len(block)
+            total_rows += block_rows
+    return total_rows
+
+def bench_large_export(small_mb=64, large_mb=None):
+    """Peak RSS of loading a small and a multi-gigabyte INSERT export
+
+    The large size defaults to 2048 MB and can be set with
+    BENCH_LARGE_EXPORT_MB. Reading the whole file is only measured on the
+    small export; on the large one it would need several times its size.
+    """
+    large_mb = large_mb or int(os.environ.get('BENCH_LARGE_EXPORT_MB', '2048'))
+    print_header(f"Large export: streaming reader, {small_mb} MB vs {large_mb} MB")
+
+    workdir = tempfile.mkdtemp(prefix='karat-bench-')
+    free_bytes = shutil.disk_usage(workdir).free
+    if free_bytes < large_mb * 1024 * 1024 * 1.1:
+        shutil.rmtree(workdir, ignore_errors=True)
+        print_error(f"Need {large_mb} MB free in {workdir}, only {format_mb(free_bytes)} available")
+        print_info("Set BENCH_LARGE_EXPORT_MB to a smaller size")
+        return
+
+    print(f"{'FILE':>9} | {'READER':<10} | {'ROWS':>11} | {'SECONDS':>8} | {'MB/S':>6} | {'PEAK RSS':>10}")
+    print("-" * 70)
+
+    try:
+        runs = [(small_mb, 'read'), (small_mb, 'stream'), (large_mb, 'stream')]
+        written = {}
+        for size_mb, mode in runs:
+            path = os.path.join(workdir, f"sales_log_{size_mb}.sql")
+            if size_mb not in written:
+                written[size_mb] = write_large_export(path, size_mb * 1024 * 1024)
+            code, seconds, peak, output = run_with_rusage(
+                [sys.executable, '-c', LARGE_EXPORT_LOADER, MIGRATION_DIR, mode, path])
+            if code != 0:
+                print(output[-2000:])
+                print_error(f"Loading the {size_mb} MB export failed")
+                sys.exit(1)
+            rows = int(output.split()[-1])
+            if mode == 'stream' and rows != written[size_mb]:
+                print_error(f"{size_mb} MB export: read {rows} rows, wrote {written[size_mb]}")
+                sys.exit(1)
+            file_mb = os.path.getsize(path) / (1024 * 1024)
+            print(f"{file_mb:>6.0f} MB | {mode:<10} | {rows:>11,} | {seconds:>7.1f}s | "
+                  f"{file_mb / seconds:>6.1f} | {format_mb(peak):>10}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print()
+    print_success("Streaming peak RSS should not grow with the file size")
+    print_info("'read' splits on every ';', including those inside quoted values, so its count is off")
+    print()
+
+E2E_RESULTS_FILE = 'benchmark-e2e.json'
+E2E_PHASES = ('export', 'import', 'verify')
+
+def bench_e2e(sizes=None, latency=0.005, options=('--jobs', '4', '--pipeline', '2')):
+    """Export, import and verify every table end to end, per table size
+
+    The source is mock_postgrest.py serving synthetic rows for all tables;
+    the target is a disposable PostgreSQL built from setup-complete.sql.
+    Sizes (rows per table) come from BENCH_E2E_SIZES, e.g. 1000,10000,100000.
+    Each command runs as its own process, so its peak RSS can be measured,
+    and writes the metrics-<command>.json the per-table figures are read from.
+    Results are saved to benchmark-e2e.json in the current directory; an
+    earlier file there is the baseline, and a phase more than 20% (and half
+    a second) slower fails the run, whose results then go to
+    benchmark-e2e-failed.json instead.
+    """
+    from mock_postgrest import MockPostgREST
+
+    print_header("End to end: export, import, verify")
+
+    if sizes is None:
+        sizes = [int(size) for size in os.environ.get('BENCH_E2E_SIZES', '1000,10000').split(',')]
+    results_path = os.path.abspath(E2E_RESULTS_FILE)
+    previous = None
+    if os.path.exists(results_path):
+        with open(results_path, 'r') as f:
+            previous = json.load(f)
+
+    results = {'options': list(options), 'latency': latency, 'sizes': {}}
+    with disposable_postgres() as target:
+        for rows in sizes:
+            print_info(f"{rows:,} rows per table...")
+            tables = synthetic_tables(rows)
+            config = {**target, 'TABLES': ','.join(tables)}
+
+            with MockPostgREST(tables, latency=latency) as mock:
+                config['SOURCE_URL'] = mock.url
+                with bench_workspace(config):
+                    phases = {}
+                    table_metrics = {}
+                    for command in E2E_PHASES:
+                        code, seconds, peak, output = run_with_rusage(
+                            [sys.executable, os.path.join(MIGRATION_DIR, 'migrate-api.py'), command, *options])
+                        if code != 0:
+                            print(output[-3000:])
+                            print_error(f"{command} exited with {code} at {rows} rows")
+                            sys.exit(1)
+                        with open('migration/.last_export', 'r') as f:
+                            export_dir = f.read().strip()
+                        with open(os.path.join(export_dir, f"metrics-{command}.json"), 'r') as f:
+                            report = json.load(f)
+                        phases[command] = {'seconds': round(seconds, 3), 'peak_rss': peak}
+                        for table, counters in report['tables'].items():
+                            table_metrics.setdefault(table, {}).update(counters)
+
+            mismatched = [table for table, counters in table_metrics.items()
+                          if not counters.get('row_counts_match')]
+            total_rows = sum(len(table_rows) for table_rows in tables.values())
+            for phase in phases.values():
+                phase['rows_per_second'] = round(total_rows / phase['seconds'], 1)
+            results['sizes'][str(rows)] = {'phases': phases, 'tables': table_metrics,
+                                           'mismatched': mismatched}
+
+    print()
+    print(f"{'ROWS/TABLE':>10} | {'PHASE':<7} | {'SECONDS':>8} | {'ROWS/S':>10} | {'PEAK RSS':>10}")
+    print("-" * 60)
+    for rows, result in results['sizes'].items():
+        for command, phase in result['phases'].items():
+            print(f"{int(rows):>10} | {command:<7} | {phase['seconds']:>8.2f} | "
+                  f"{phase['rows_per_second']:>10,.0f} | {format_mb(phase['peak_rss']):>10}")
+
+    print()
+    print(f"{'ROWS/TABLE':>10} | {'TABLE':<22} | {'EXPORT R/S':>10} | {'IMPORT R/S':>10} | "
+          f"{'PAGE P50':>9} | {'PAGE P95':>9}")
+    print("-" * 86)
+    for rows, result in results['sizes'].items():
+        for table, counters in result['tables'].items():
+            latency_ms = counters.get('page_latency_ms', {})
+            print(f"{int(rows):>10} | {table:<22} | {counters.get('export_rows_per_second', 0):>10,.0f} | "
+                  f"{counters.get('import_rows_per_second', 0):>10,.0f} | "
+                  f"{latency_ms.get('p50', 0):>7.1f}ms | {latency_ms.get('p95', 0):>7.1f}ms")
+    print()
+
+    failed = False
+    for rows, result in results['sizes'].items():
+        if result['mismatched']:
+            print_error(f"{rows} rows: row counts differ for {', '.join(result['mismatched'])}")
+            failed = True
+
+    if previous:
+        for rows, result in results['sizes'].items():
+            before = previous.get('sizes', {}).get(rows)
+            if not before:
+                continue
+            for command, phase in result['phases'].items():
+                old = before['phases'].get(command)
+                if not old:
+                    continue
+                change = (phase['seconds'] - old['seconds']) / old['seconds'] * 100
+                line = f"{rows} rows, {command}: {old['seconds']:.2f}s -> {phase['seconds']:.2f}s ({change:+.0f}%)"
+                # Sub-second phases jitter by more than 20% on their own
+                if change > 20 and phase['seconds'] - old['seconds'] > 0.5:
+                    print_error(f"Slower than the previous run: {line}")
+                    failed = True
+                else:
+                    print_info(line)
+
+    # A failing run is kept beside the baseline rather than replacing it
+    if failed:
+        results_path = results_path.replace('.json', '-failed.json')
+    with open(results_path, 'w') as f:
+        json.dump(results, f, indent=2)
+    print_info(f"Results written to {results_path}")
+    if failed:
+        sys.exit(1)
+    print_success("All sizes migrated with matching row counts")
+    print()
+
+def bench_pg_transfer(rows=100000, latency=0.02):
+    """full over the REST API versus full with SOURCE_TYPE=postgresql
+
+    Both runs migrate the same synthetic tables into a disposable cluster;
+    the direct run reads them from a second database in the same cluster,
+    the REST run from mock_postgrest.py with a per-request latency.
+    """
+    import psycopg2
+    from mock_postgrest import MockPostgREST
+
+    print_header("Full migration: REST API vs direct PostgreSQL")
+
+    tables = synthetic_tables(rows)
+    total_rows = sum(len(table_rows) for table_rows in tables.values())
+    results = {}
+
+    with disposable_postgres() as target:
+        port = target['TARGET_PORT']
+        create_schema_database(port, 'karat_bench_source')
+        print_info(f"Loading {total_rows:,} synthetic rows into the source database...")
+        with bench_workspace(target):
+            api = load_migrate_api()
+        conn = psycopg2.connect(host='localhost', port=port, dbname='karat_bench_source', user='postgres')
+        with conn, conn.cursor() as cursor:
+            for table, table_rows in tables.items():
+                columns = list(table_rows[0].keys())
+                copy_sql = api.generate_copy_header(table, columns).rstrip(';')
+                cursor.copy_expert(copy_sql, io.StringIO(api.generate_copy_rows(columns, table_rows) + '\n'))
+        conn.close()
+
+        source = {
+            'SOURCE_TYPE': 'postgresql',
+            'SOURCE_HOST': 'localhost',
+            'SOURCE_PORT': port,
+            'SOURCE_DB_NAME': 'karat_bench_source',
+            'SOURCE_USER': 'postgres',
+            'SOURCE_PASSWORD': '',
+        }
+        runs = {
+            'REST (copy format)': ({}, ['--format=copy', '--jobs', '4', '--pipeline', '2']),
+            'direct PostgreSQL': (source, ['--jobs', '4']),
+        }
+
+        with MockPostgREST(tables, latency=latency) as mock:
+            for label, (settings, options) in runs.items():
+                config = {**target, **settings, 'TABLES': ','.join(tables), 'SOURCE_URL': mock.url}
+                with bench_workspace(config):
+                    code, seconds, peak, output = run_with_rusage(
+                        [sys.executable, os.path.join(MIGRATION_DIR, 'migrate-api.py'), 'full', *options])
+                if code != 0 or "All table row counts match" not in output:
+                    print(output[-3000:])
+                    print_error(f"{label} run failed")
+                    sys.exit(1)
+                results[label] = (seconds, peak)
+
+    print()
+    print(f"{'SOURCE':<20} | {'SECONDS':>8} | {'ROWS/S':>10} | {'PEAK RSS':>10}")
+    print("-" * 58)
+    for label, (seconds, peak) in results.items():
+        print(f"{label:<20} | {seconds:>8.2f} | {total_rows / seconds:>10,.0f} | {format_mb(peak):>10}")
+    print()
+    rest_seconds = results['REST (copy format)'][0]
+    direct_seconds = results['direct PostgreSQL'][0]
+    print(f"Speedup: {rest_seconds / direct_seconds:.1f}x ({rows:,} rows per table, {latency * 1000:.0f}ms REST latency)")
+    print()
+
+BENCHMARKS = {
+    'export-memory': bench_export_memory,
+    'copy-vs-insert': bench_copy_vs_insert,
+    'keyset-vs-offset': bench_keyset_vs_offset,
+    'rest-client': bench_rest_client,
+    'flow-control': bench_flow_control,
+    'store': bench_store,
+    'fast-load': bench_fast_load,
+    'swap': bench_swap,
+    'partitions': bench_partitions,
+    'payloads': bench_payloads,
+    'export-formats': bench_export_formats,
+    'large-export': bench_large_export,
+    'shards': bench_shards,
+    'serialize': bench_serialize,
+    'e2e': bench_e2e,
+    'pg-transfer': bench_pg_transfer,
+}
+
+def main():
+    names = sys.argv[1:] or list(BENCHMARKS)
+    unknown = [name for name in names if name not in BENCHMARKS]
+    if unknown:
+        print_error(f"Unknown benchmark: {', '.join(unknown)}")
+        print(f"Usage: python benchmark.py [{'|'.join(BENCHMARKS)}] ...")
+        sys.exit(1)
+
+    for name in names:
+        BENCHMARKS[name]()
+
+if __name__ == "__main__":
+    main()
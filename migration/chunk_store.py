@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Export Chunk Store
+Content-addressed store of monthly export chunks for migrate-api.py export --store
+"""
+
+import io
+import os
+import gzip
+import shutil
+import hashlib
+import tempfile
+
+from export_manifest import ExportManifest
+from sql_loader import NDJSON_SUFFIX
+
+# Chunk bytes held in memory before spilling to a temporary file
+CHUNK_MEMORY_BYTES = 32 * 1024 * 1024
+
+class ChunkStore:
+    """Chunk files under root/chunks, named by their SHA-256"""
+
+    def __init__(self, root):
+        self.root = root
+
+    def path(self, sha256, suffix):
+        return os.path.join(self.root, 'chunks', sha256[:2], sha256 + suffix)
+
+    def writer(self, suffix, compress=False):
+        """A ChunkWriter for one chunk; compress gzips it (for ndjson chunks)"""
+        return ChunkWriter(self, suffix, compress)
+
+    def size(self):
+        """Bytes of chunk files in the store"""
+        total = 0
+        for directory, _, files in os.walk(os.path.join(self.root, 'chunks')):
+            total += sum(os.path.getsize(os.path.join(directory, name)) for name in files)
+        return total
+
+class ChunkWriter:
+    """Collects one chunk's text, then stores it under its hash unless already present"""
+
+    def __init__(self, store, suffix, compress=False):
+        self.store = store
+        self.suffix = suffix
+        self.compress = compress
+        self.buffer = io.BytesIO()
+        self.spill = None
+
+    def write(self, text):
+        data = text.encode('utf-8')
+        if self.spill is not None:
+            self.spill.write(data)
+            return
+        self.buffer.write(data)
+        if self.buffer.tell() > CHUNK_MEMORY_BYTES:
+            os.makedirs(self.store.root, exist_ok=True)
+            self.spill = tempfile.TemporaryFile(dir=self.store.root)
+            self.spill.write(self.buffer.getvalue())
+            self.buffer = io.BytesIO()
+
+    def _stored_bytes(self):
+        """The chunk as it is stored, in memory or as a temporary file"""
+        if self.spill is None:
+            data = self.buffer.getvalue()
+            # mtime=0 keeps the same rows hashing to the same chunk
+            return gzip.compress(data, mtime=0) if self.compress else data
+
+        self.spill.seek(0)
+        if not self.compress:
+            return self.spill
+        compressed = tempfile.TemporaryFile(dir=self.store.root)
+        with gzip.GzipFile(fileobj=compressed, mode='wb', mtime=0) as f:
+            shutil.copyfileobj(self.spill, f)
+        self.spill.close()
+        self.spill = compressed
+        self.spill.seek(0)
+        return self.spill
+
+    def commit(self):
+        """Store the chunk; returns (sha256, stored bytes, whether it was new)"""
+        stored = self._stored_bytes()
+        digest = hashlib.sha256()
+        if isinstance(stored, bytes):
+            digest.update(stored)
+            size = len(stored)
+        else:
+            for block in iter(lambda: stored.read(1024 * 1024), b''):
+                digest.update(block)
+            size = stored.tell()
+        sha256 = digest.hexdigest()
+
+        path = self.store.path(sha256, self.suffix)
+        new = not os.path.exists(path)
+        if new:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write-then-rename, so a crash never leaves a truncated chunk under a valid name
+            fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                if isinstance(stored, bytes):
+                    f.write(stored)
+                else:
+                    stored.seek(0)
+                    shutil.copyfileobj(stored, f)
+            os.replace(temp_path, path)
+        self.close()
+        return sha256, size, new
+
+    def close(self):
+        if self.spill is not None:
+            self.spill.close()
+            self.spill = None
+        self.buffer = io.BytesIO()
+
+def month_keys(first, last):
+    """Month keys ('2024-01', ...) from first to last inclusive"""
+    year, month = int(first[:4]), int(first[5:7])
+    keys = []
+    while f"{year:04d}-{month:02d}" <= last:
+        keys.append(f"{year:04d}-{month:02d}")
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return keys
+
+def next_month(key):
+    """First day of the month after a month key, as a date string"""
+    year, month = int(key[:4]), int(key[5:7])
+    year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return f"{year:04d}-{month:02d}-01"
+
+def manifest_chunks(manifest, table):
+    """(path, SHA-256) of each chunk with rows that a --store manifest lists for a table"""
+    store = ChunkStore(manifest.store)
+    suffix = NDJSON_SUFFIX if manifest.format == 'ndjson' else '.sql'
+    return [(store.path(chunk['sha256'], suffix), chunk['sha256'])
+            for chunk in manifest.table(table).get('chunks') or [] if chunk.get('rows')]
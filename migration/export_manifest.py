@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Export Manifest
+Checkpoint file (manifest.json) kept in each export directory so exports and
+imports can resume after a failure instead of starting over
+
+Per table it records the export status, the keyset cursor of every id range,
+rows and bytes written so far, the columns of the file and, once complete,
+the SHA-256 of the table file. A table exported in shards keeps those fields
+per shard, in a 'shards' list. An export made with --store has no table
+files: 'store' names the chunk store and each table lists its 'chunks'.
+'deferred' marks an export made without the DEFERRED_COLUMNS. Imports
+record their own per-table status.
+"""
+
+import os
+import copy
+import json
+import hashlib
+import threading
+from datetime import datetime
+
+MANIFEST_NAME = 'manifest.json'
+
+def file_sha256(path):
+    """SHA-256 of a file, read in 1 MB blocks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+class ExportManifest:
+    """manifest.json for one export directory, safe to update from worker threads"""
+
+    def __init__(self, export_dir, data):
+        self.export_dir = export_dir
+        self.data = data
+        self._lock = threading.Lock()
+
+    @property
+    def path(self):
+        return os.path.join(self.export_dir, MANIFEST_NAME)
+
+    @property
+    def format(self):
+        return self.data.get('format', 'insert')
+
+    @property
+    def store(self):
+        """Chunk store directory of a --store export, else None"""
+        return self.data.get('store')
+
+    @property
+    def deferred(self):
+        """Whether the export left out the DEFERRED_COLUMNS (export --defer-payloads)"""
+        return self.data.get('deferred', False)
+
+    @classmethod
+    def create(cls, export_dir, export_format, tables, store=None, deferred=False):
+        data = {
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'format': export_format,
+            'tables': {table: {'status': 'pending'} for table in tables},
+        }
+        if store:
+            data['store'] = store
+        if deferred:
+            data['deferred'] = True
+        manifest = cls(export_dir, data)
+        manifest.save()
+        return manifest
+
+    @classmethod
+    def load(cls, export_dir):
+        """Load the manifest of an export directory, or None for older exports"""
+        path = os.path.join(export_dir, MANIFEST_NAME)
+        if not os.path.exists(path):
+            return None
+        with open(path, 'r') as f:
+            return cls(export_dir, json.load(f))
+
+    def table(self, name, shard=None):
+        """A deep copy of one table's entry, or of its shard'th shard (empty if not listed)
+
+        Callers may change the copy, nested lists included, and pass it back
+        through update(); the manifest itself only changes under the lock.
+        """
+        with self._lock:
+            entry = self.data['tables'].get(name, {})
+            if shard is not None:
+                shards = entry.get('shards') or []
+                entry = shards[shard] if shard < len(shards) else {}
+            return copy.deepcopy(entry)
+
+    def update(self, name, shard=None, **fields):
+        """Merge copies of fields into a table's (or one shard's) entry and write the manifest to disk"""
+        with self._lock:
+            entry = self.data['tables'].setdefault(name, {})
+            if shard is not None:
+                shards = entry.setdefault('shards', [])
+                while len(shards) <= shard:
+                    shards.append({'status': 'pending'})
+                entry = shards[shard]
+            entry.update(copy.deepcopy(fields))
+            self._write()
+
+    def save(self):
+        with self._lock:
+            self._write()
+
+    def _write(self):
+        # Write-then-rename, so a crash mid-write leaves the previous checkpoint
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump(self.data, f, indent=2)
+        os.replace(temp_path, self.path)
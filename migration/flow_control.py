@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+REST Flow Control
+Adapts REST page size and requests in flight to the source, as TCP congestion control does
+"""
+
+import time
+import threading
+
+class Throttle:
+    """Pause shared by every request while the source asks clients to back off"""
+
+    def __init__(self):
+        self.resume_at = 0.0
+        self._lock = threading.Lock()
+
+    def hold(self, seconds):
+        """Hold every request for at least seconds from now"""
+        with self._lock:
+            self.resume_at = max(self.resume_at, time.monotonic() + seconds)
+
+    def wait(self):
+        """Sleep until the current hold (if any) is over"""
+        while True:
+            with self._lock:
+                remaining = self.resume_at - time.monotonic()
+            if remaining <= 0:
+                return
+            time.sleep(remaining)
+
+class FlowController:
+    """Page size and in-flight request limit for one table, tuned AIMD-style from every response"""
+
+    def __init__(self, page_size=1000, min_page_size=100, max_page_size=5000, max_in_flight=1,
+                 target_seconds=2.0, max_page_bytes=8 * 1024 * 1024):
+        self._page_size = float(page_size)
+        self.min_page_size = min(min_page_size, page_size)
+        self.max_page_size = max(max_page_size, page_size)
+        self.max_in_flight = max(max_in_flight, 1)
+        self._in_flight = float(self.max_in_flight)
+        self.target_seconds = target_seconds
+        self.max_page_bytes = max_page_bytes
+        self.best_seconds_per_row = None
+        self.throttled_count = 0
+        self._lock = threading.Lock()
+
+    @property
+    def page_size(self):
+        with self._lock:
+            return int(self._page_size)
+
+    @property
+    def in_flight(self):
+        with self._lock:
+            return int(self._in_flight)
+
+    def record(self, seconds, rows, body_bytes, limit):
+        """Adjust to one successful page of rows out of the limit requested"""
+        with self._lock:
+            if rows >= limit:
+                if seconds <= self.target_seconds and body_bytes <= self.max_page_bytes:
+                    self._page_size = min(self._page_size * 1.25, self.max_page_size)
+                else:
+                    self._page_size = max(self._page_size * 0.75, self.min_page_size)
+
+            if not rows:
+                return
+            seconds_per_row = seconds / rows
+            if self.best_seconds_per_row is None or seconds_per_row < self.best_seconds_per_row:
+                self.best_seconds_per_row = seconds_per_row
+            if seconds_per_row > 2 * self.best_seconds_per_row:
+                self._in_flight = max(self._in_flight - 1, 1.0)
+            else:
+                self._in_flight = min(self._in_flight + 1 / self._in_flight, self.max_in_flight)
+
+    def throttled(self):
+        """Back off after a throttled or failed request"""
+        with self._lock:
+            self.throttled_count += 1
+            self._page_size = max(self._page_size / 2, self.min_page_size)
+            self._in_flight = max(self._in_flight / 2, 1.0)
+
+    def cap(self, rows):
+        """The source returned only rows per page although more were left: its max-rows limit"""
+        with self._lock:
+            self.max_page_size = max(rows, 1)
+            self.min_page_size = min(self.min_page_size, self.max_page_size)
+            self._page_size = min(self._page_size, self.max_page_size)
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Run Metrics
+Timing and throughput counters for a migration run, written as a JSON report
+next to the export so slow runs can be traced to fetching, decoding, SQL
+generation, disk writes or the import
+"""
+
+import os
+import json
+import math
+import time
+import threading
+import contextlib
+from datetime import datetime
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of an unsorted list (None if empty)"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+class RunMetrics:
+    """Counters for one run, safe to update from worker threads
+
+    phases holds wall-clock seconds per step (export, import, verify).
+    tables holds per-table counters; the *_seconds ones are summed across
+    workers, so with --jobs or --pipeline they can exceed the wall time.
+    """
+
+    def __init__(self):
+        self.command = None
+        self.started_at = datetime.now()
+        self.phases = {}
+        self.tables = {}
+        self.page_latencies = {}
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """Time a block and add it to the named phase"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self.phases[name] = self.phases.get(name, 0.0) + elapsed
+
+    def add(self, table, **counters):
+        """Add to a table's counters, e.g. add('users', rows=10, write_seconds=0.2)"""
+        with self._lock:
+            entry = self.tables.setdefault(table, {})
+            for key, value in counters.items():
+                entry[key] = entry.get(key, 0) + value
+
+    def record_page(self, table, fetch_seconds, decode_seconds, rows, body_bytes, wire_bytes):
+        """One REST page: request latency, JSON decode time and size"""
+        self.add(table, pages=1, fetched_rows=rows, fetch_seconds=fetch_seconds,
+                 decode_seconds=decode_seconds, body_bytes=body_bytes, wire_bytes=wire_bytes)
+        with self._lock:
+            self.page_latencies.setdefault(table, []).append(fetch_seconds)
+
+    def report(self):
+        """The whole run as a JSON-serialisable dict"""
+        with self._lock:
+            tables = {}
+            for table, counters in self.tables.items():
+                entry = {key: round(value, 4) if isinstance(value, float) else value
+                         for key, value in counters.items()}
+                latencies = self.page_latencies.get(table, [])
+                if latencies:
+                    entry['page_latency_ms'] = {
+                        'p50': round(percentile(latencies, 0.50) * 1000, 1),
+                        'p95': round(percentile(latencies, 0.95) * 1000, 1),
+                        'max': round(max(latencies) * 1000, 1),
+                    }
+                if counters.get('export_seconds'):
+                    entry['export_rows_per_second'] = round(
+                        counters.get('fetched_rows', 0) / counters['export_seconds'], 1)
+                if counters.get('import_seconds'):
+                    entry['import_rows_per_second'] = round(
+                        counters.get('import_rows', 0) / counters['import_seconds'], 1)
+                tables[table] = entry
+
+            return {
+                'command': self.command,
+                'started_at': self.started_at.isoformat(timespec='seconds'),
+                'finished_at': datetime.now().isoformat(timespec='seconds'),
+                'phases': {name: round(seconds, 4) for name, seconds in self.phases.items()},
+                'tables': tables,
+            }
+
+    def totals(self):
+        """Seconds per activity summed over all tables, for a one-line summary"""
+        with self._lock:
+            totals = {}
+            for counters in self.tables.values():
+                for activity in ('fetch', 'decode', 'generate', 'write', 'import'):
+                    seconds = counters.get(f'{activity}_seconds')
+                    if seconds is not None:
+                        totals[activity] = totals.get(activity, 0.0) + seconds
+            return totals
+
+    def write(self, directory):
+        """Write metrics-<command>.json into directory and return its path"""
+        path = os.path.join(directory, f"metrics-{self.command}.json")
+        with open(path, 'w') as f:
+            json.dump(self.report(), f, indent=2)
+        return path
@@ -0,0 +1,309 @@
+#!/usr/bin/env python3
+"""
+Mock PostgREST Server
+Serves in-memory tables over the subset of the PostgREST API the migration
+tools use, for benchmarks against a local endpoint instead of Supabase
+
+Supported: select=* / select=count / select=col,col, order=col[.asc|.desc],
+limit, offset (responses capped at max_rows, like Supabase),
+col=[not.]eq|neq|gt|gte|lt|lte|is.value filters (repeatable), col=in.(a,b,...)
+lists, or=(...)/and=(...) logic trees, the
+Prefer: count=exact header (answered with Content-Range), HEAD requests,
+HTTP/1.1 keep-alive and gzip responses when the client accepts them.
+With max_concurrent set, requests beyond that many at once are refused with
+429 and a Retry-After header, like a rate-limited project.
+
+Like PostgreSQL, the mock has to walk past every skipped row to honour an
+offset, while a range filter on the sorted id column is answered with a
+binary search, the way an index scan would be.
+"""
+
+import sys
+import gzip
+import json
+import time
+import bisect
+import threading
+from itertools import islice
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qsl
+
+FILTER_OPS = {
+    'is': None,
+    'eq': lambda a, b: a == b,
+    'neq': lambda a, b: a != b,
+    'gt': lambda a, b: a > b,
+    'gte': lambda a, b: a >= b,
+    'lt': lambda a, b: a < b,
+    'lte': lambda a, b: a <= b,
+}
+
+def matches(value, compare, operand):
+    """Apply a filter, comparing numbers as numbers and everything else as text"""
+    if compare is None:
+        # is.null / is.true / is.false
+        return {'null': None, 'true': True, 'false': False}[operand] is value
+    if value is None:
+        return False
+    if isinstance(value, bool):
+        return compare(str(value).lower(), operand)
+    if isinstance(value, (int, float)):
+        return compare(value, float(operand))
+    return compare(str(value), operand)
+
+def split_top_level(text):
+    """Split a logic-tree argument list on commas outside parentheses"""
+    parts, depth, current = [], 0, ''
+    for char in text:
+        if char == ',' and depth == 0:
+            parts.append(current)
+            current = ''
+            continue
+        depth += {'(': 1, ')': -1}.get(char, 0)
+        current += char
+    if current:
+        parts.append(current)
+    return parts
+
+def parse_logic(combinator, text):
+    """Compile or=(...)/and=(...) into a row predicate"""
+    conditions = []
+    for item in split_top_level(text[1:-1]):
+        if item.startswith(('and(', 'or(')):
+            name, rest = item.split('(', 1)
+            conditions.append(parse_logic(name, '(' + rest))
+        else:
+            column, op, operand = item.split('.', 2)
+            conditions.append(lambda row, c=column, f=FILTER_OPS[op], v=operand:
+                              matches(row.get(c), f, v))
+    combine = any if combinator == 'or' else all
+    return lambda row: combine(condition(row) for condition in conditions)
+
+class MockPostgREST:
+    """In-process PostgREST stand-in; tables maps name -> list of row dicts"""
+
+    def __init__(self, tables, latency=0.0, max_rows=1000, host='127.0.0.1', port=0,
+                 max_concurrent=None, retry_after=1):
+        self.latency = latency
+        self.max_rows = max_rows
+        self.max_concurrent = max_concurrent
+        self.retry_after = retry_after
+        self.active = 0
+        self.throttled = 0
+        self._lock = threading.Lock()
+        self.tables = {}
+        self.ids = {}
+        for name, rows in tables.items():
+            self.load_table(name, rows)
+        self.server = ThreadingHTTPServer((host, port), self.make_handler())
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def load_table(self, name, rows):
+        """Store rows sorted by id, the order an id index would return them in"""
+        rows = sorted(rows, key=lambda row: row['id'])
+        self.tables[name] = rows
+        self.ids[name] = [row['id'] for row in rows]
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    # ============================================
+    # Query evaluation
+    # ============================================
+
+    def query(self, table, params, max_rows=None):
+        """Evaluate a PostgREST query and return the matching rows"""
+        rows = self.tables[table]
+        ids = self.ids[table]
+
+        filters = []
+        predicates = []
+        for key, value in params:
+            if key in ('or', 'and'):
+                predicates.append(parse_logic(key, value))
+                continue
+            if key in ('select', 'order', 'limit', 'offset') or '.' not in value:
+                continue
+            if value.startswith('in.('):
+                wanted = set(value[4:-1].split(','))
+                predicates.append(lambda row, c=key, w=wanted: str(row.get(c)) in w)
+                if key == 'id':
+                    # Only the slice of the index between the lowest and highest id can match
+                    filters += [('id', FILTER_OPS['gte'], 'gte', min(wanted)),
+                                ('id', FILTER_OPS['lte'], 'lte', max(wanted))]
+                continue
+            if value.startswith('not.'):
+                op, operand = value[4:].split('.', 1)
+                predicates.append(lambda row, c=key, f=FILTER_OPS[op], v=operand:
+                                  not matches(row.get(c), f, v))
+                continue
+            op, operand = value.split('.', 1)
+            if op in FILTER_OPS:
+                filters.append((key, FILTER_OPS[op], op, operand))
+
+        # Index range scan on id, like a btree lookup
+        lo, hi = 0, len(rows)
+        for column, compare, op, operand in filters:
+            if column != 'id' or op not in ('gt', 'gte', 'lt', 'lte'):
+                predicates.append(lambda row, c=column, f=compare, v=operand:
+                                  matches(row.get(c), f, v))
+            elif op == 'gt':
+                lo = max(lo, bisect.bisect_right(ids, operand))
+            elif op == 'gte':
+                lo = max(lo, bisect.bisect_left(ids, operand))
+            elif op == 'lt':
+                hi = min(hi, bisect.bisect_left(ids, operand))
+            else:
+                hi = min(hi, bisect.bisect_right(ids, operand))
+
+        def scan():
+            for i in range(lo, hi):
+                row = rows[i]
+                if all(predicate(row) for predicate in predicates):
+                    yield row
+
+        order = dict(params).get('order')
+        matched = scan()
+        if order and order.split(',')[0].split('.')[0] != 'id':
+            keys = [part.split('.') for part in order.split(',')]
+            matched = list(matched)
+            for key in reversed(keys):
+                descending = len(key) > 1 and key[1] == 'desc'
+                matched.sort(key=lambda row: (row.get(key[0]) is None, str(row.get(key[0]))),
+                             reverse=descending)
+            matched = iter(matched)
+        elif order and order.endswith('.desc'):
+            matched = reversed(list(matched))
+
+        # Like Supabase's max-rows setting, silently cap every response
+        offset = int(dict(params).get('offset', 0))
+        limit = dict(params).get('limit')
+        limit = int(limit) if limit is not None else max_rows
+        if max_rows:
+            limit = min(limit, max_rows)
+        stop = offset + limit if limit is not None else None
+
+        # Offsets are honoured by walking the skipped rows, as PostgreSQL does
+        return list(islice(matched, offset, stop))
+
+    def count(self, table, params):
+        filters = [(k, v) for k, v in params if k not in ('limit', 'offset', 'order')]
+        return len(self.query(table, filters))
+
+    def make_handler(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # Headers and body are separate writes; without TCP_NODELAY a
+            # kept-alive connection stalls on delayed ACKs like no real server does
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def respond(self, status, body=b'', headers=None, include_body=True):
+                if body and 'gzip' in self.headers.get('Accept-Encoding', ''):
+                    body = gzip.compress(body, compresslevel=1)
+                    headers = {**(headers or {}), 'Content-Encoding': 'gzip'}
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                if include_body:
+                    self.wfile.write(body)
+
+            def handle_query(self, include_body):
+                with mock._lock:
+                    refused = mock.max_concurrent is not None and mock.active >= mock.max_concurrent
+                    if refused:
+                        mock.throttled += 1
+                    else:
+                        mock.active += 1
+                if refused:
+                    self.respond(429, b'{"message":"rate limit exceeded"}',
+                                 {'Retry-After': str(mock.retry_after)}, include_body)
+                    return
+                try:
+                    self.answer_query(include_body)
+                finally:
+                    with mock._lock:
+                        mock.active -= 1
+
+            def answer_query(self, include_body):
+                if mock.latency:
+                    time.sleep(mock.latency)
+
+                url = urlparse(self.path)
+                table = url.path.rsplit('/', 1)[-1]
+                if not url.path.startswith('/rest/v1/') or table not in mock.tables:
+                    self.respond(404, b'{"message":"relation does not exist"}', include_body=include_body)
+                    return
+
+                params = parse_qsl(url.query, keep_blank_values=True)
+                select = dict(params).get('select', '*')
+                headers = {}
+
+                if 'count=exact' in self.headers.get('Prefer', ''):
+                    total = mock.count(table, params)
+                    headers['Content-Range'] = f"*/{total}"
+
+                if select == 'count':
+                    body = [{'count': mock.count(table, params)}]
+                else:
+                    rows = mock.query(table, params, mock.max_rows)
+                    if select != '*':
+                        columns = select.split(',')
+                        rows = [{col: row.get(col) for col in columns} for row in rows]
+                    body = rows
+                    if 'Content-Range' in headers and rows:
+                        offset = int(dict(params).get('offset', 0))
+                        headers['Content-Range'] = (
+                            f"{offset}-{offset + len(rows) - 1}/{headers['Content-Range'][2:]}")
+
+                self.respond(200, json.dumps(body).encode('utf-8'), headers, include_body)
+
+            def do_GET(self):
+                self.handle_query(include_body=True)
+
+            def do_HEAD(self):
+                self.handle_query(include_body=False)
+
+        return Handler
+
+def main():
+    """Serve synthetic tables: python mock_postgrest.py [port] [rows per table]"""
+    import benchmark
+
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 3000
+    rows = int(sys.argv[2]) if len(sys.argv) > 2 else 10000
+    tables = {'sales_log': [row for page in benchmark.synthetic_pages(rows) for row in page]}
+    with MockPostgREST(tables, port=port) as mock:
+        print(f"Mock PostgREST serving {rows} sales_log rows at {mock.url}/rest/v1/")
+        try:
+            mock.thread.join()
+        except KeyboardInterrupt:
+            pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Monthly Table Partitions
+One-month range partitions plus a default partition, for import --partition and archive
+"""
+
+from datetime import date
+
+import psycopg2
+
+from table_swap import rows, quote_ident, partitions
+
+# Months after the current one that always have a partition ready
+PARTITION_PREMAKE_MONTHS = 3
+
+def add_months(month, count):
+    """The first day of the month count months after (or before) a month's first day"""
+    index = month.year * 12 + month.month - 1 + count
+    return date(index // 12, index % 12 + 1, 1)
+
+def current_month():
+    return date.today().replace(day=1)
+
+def partition_name(table, month):
+    return f"{table}_p{month.year:04d}_{month.month:02d}"
+
+def default_partition_name(table):
+    return f"{table}_default"
+
+def partition_month(table, name):
+    """The month of a table_pYYYY_MM partition, or None for any other name"""
+    prefix = f"{table}_p"
+    suffix = name[len(prefix):]
+    if not name.startswith(prefix) or len(suffix) != 7 or suffix[4] != '_':
+        return None
+    try:
+        return date(int(suffix[:4]), int(suffix[5:]), 1)
+    except ValueError:
+        return None
+
+def partition_column(conn, schema, table):
+    """(column, data type) a range-partitioned schema.table is partitioned by, or None"""
+    found = rows(conn,
+        "SELECT a.attname, format_type(a.atttypid, a.atttypmod) FROM pg_partitioned_table p "
+        "JOIN pg_attribute a ON a.attrelid = p.partrelid AND a.attnum = p.partattrs[0] "
+        "WHERE p.partrelid = to_regclass(%s) AND p.partstrat = 'r';",
+        (f'{schema}.{table}',))
+    return tuple(found[0]) if found else None
+
+def month_bound(month, data_type):
+    """The literal a partition bound of a month starts at"""
+    if data_type == 'timestamp with time zone':
+        return f"'{month.isoformat()} 00:00:00+00'"
+    return f"'{month.isoformat()}'"
+
+def month_expression(expression, data_type):
+    """SQL for the first day of the month of a value of the partition column, matching month_bound"""
+    if data_type == 'timestamp with time zone':
+        return f"date_trunc('month', {expression} AT TIME ZONE 'UTC')::date"
+    return f"date_trunc('month', {expression})::date"
+
+def months_with_rows(conn, relation, column, data_type):
+    """Months that have rows in relation, oldest first"""
+    return [row[0] for row in rows(conn,
+        f"SELECT DISTINCT {month_expression(quote_ident(column), data_type)} FROM {relation} "
+        f"WHERE {quote_ident(column)} IS NOT NULL ORDER BY 1;")]
+
+def month_span(conn, relation, column, data_type):
+    """Every month from the oldest to the newest row of relation; [] if it has none"""
+    oldest, newest = rows(conn,
+        f"SELECT {month_expression(f'min({quote_ident(column)})', data_type)}, "
+        f"{month_expression(f'max({quote_ident(column)})', data_type)} FROM {relation};")[0]
+    if oldest is None:
+        return []
+    months = [oldest]
+    while months[-1] < newest:
+        months.append(add_months(months[-1], 1))
+    return months
+
+def column_type(conn, schema, table, column):
+    """Data type of one column of schema.table, as format_type renders it"""
+    return rows(conn,
+        "SELECT format_type(atttypid, atttypmod) FROM pg_attribute "
+        "WHERE attrelid = %s::regclass AND attname = %s;",
+        (f'{schema}.{table}', column))[0][0]
+
+def create_month_partition(conn, schema, table, month, data_type):
+    """Create the partition of one month; the default partition must not hold rows of that month"""
+    with conn.cursor() as cursor:
+        cursor.execute(f"CREATE TABLE IF NOT EXISTS {schema}.{partition_name(table, month)} "
+                       f"PARTITION OF {schema}.{table} FOR VALUES FROM ({month_bound(month, data_type)}) "
+                       f"TO ({month_bound(add_months(month, 1), data_type)});")
+
+def ensure_future_partitions(conn, schema, table, ahead=PARTITION_PREMAKE_MONTHS):
+    """Create the missing partitions of this month and the next ahead months; returns those created"""
+    column, data_type = partition_column(conn, schema, table)
+    existing = set(partitions(conn, schema, table))
+    waiting = set(months_with_rows(conn, f'{schema}.{default_partition_name(table)}', column, data_type)) \
+        if default_partition_name(table) in existing else set()
+
+    created = []
+    for offset in range(ahead + 1):
+        month = add_months(current_month(), offset)
+        if partition_name(table, month) not in existing and month not in waiting:
+            create_month_partition(conn, schema, table, month, data_type)
+            created.append(partition_name(table, month))
+    return created
+
+def split_default_partition(conn, schema, table):
+    """Move the default partition's rows into partitions of their own months; returns {partition: rows moved}"""
+    column, data_type = partition_column(conn, schema, table)
+    default = f'{schema}.{default_partition_name(table)}'
+    if default_partition_name(table) not in partitions(conn, schema, table):
+        return {}
+
+    moved = {}
+    for month in months_with_rows(conn, default, column, data_type):
+        name = partition_name(table, month)
+        low, high = month_bound(month, data_type), month_bound(add_months(month, 1), data_type)
+        conn.autocommit = False
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute(f"CREATE TABLE {schema}.{name} (LIKE {schema}.{table} INCLUDING DEFAULTS "
+                               f"INCLUDING CONSTRAINTS);")
+                # The bound as a CHECK lets ATTACH skip scanning the partition
+                cursor.execute(f"ALTER TABLE {schema}.{name} ADD CONSTRAINT {quote_ident(name + '_bound')} "
+                               f"CHECK ({quote_ident(column)} IS NOT NULL AND {quote_ident(column)} >= {low} "
+                               f"AND {quote_ident(column)} < {high});")
+                cursor.execute(f"WITH moved AS (DELETE FROM {default} WHERE {quote_ident(column)} >= {low} "
+                               f"AND {quote_ident(column)} < {high} RETURNING *) "
+                               f"INSERT INTO {schema}.{name} SELECT * FROM moved;")
+                moved[name] = cursor.rowcount
+                cursor.execute(f"ALTER TABLE {schema}.{table} ATTACH PARTITION {schema}.{name} "
+                               f"FOR VALUES FROM ({low}) TO ({high});")
+                cursor.execute(f"ALTER TABLE {schema}.{name} DROP CONSTRAINT {quote_ident(name + '_bound')};")
+            conn.commit()
+        except psycopg2.Error:
+            conn.rollback()
+            raise
+        finally:
+            conn.autocommit = True
+    return moved
+
+def maintain_partitions(conn, schema, table):
+    """Split the default partition, then premake future months; returns the partitions created"""
+    created = list(split_default_partition(conn, schema, table))
+    return created + ensure_future_partitions(conn, schema, table)
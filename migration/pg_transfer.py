@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+PostgreSQL-to-PostgreSQL Transfer
+Pipes COPY ... TO STDOUT on the source into COPY ... FROM STDIN on the target
+"""
+
+import os
+import threading
+
+import psycopg2
+
+# Bytes handed to the target per read from the pipe
+PIPE_READ_SIZE = 1 << 16
+
+def open_source_connection(config):
+    """Connect to the source database described by the SOURCE_* settings"""
+    return psycopg2.connect(
+        host=config['SOURCE_HOST'],
+        port=config.get('SOURCE_PORT', '5432'),
+        database=config['SOURCE_DB_NAME'],
+        user=config['SOURCE_USER'],
+        password=config.get('SOURCE_PASSWORD', ''),
+        connect_timeout=10
+    )
+
+def begin_snapshot(conn, snapshot=None):
+    """Start a read-only repeatable-read transaction on snapshot, or on a new exported one it returns"""
+    conn.set_session(isolation_level='REPEATABLE READ', readonly=True)
+    with conn.cursor() as cursor:
+        if snapshot:
+            cursor.execute("SET TRANSACTION SNAPSHOT %s;", (snapshot,))
+            return snapshot
+        cursor.execute("SELECT pg_export_snapshot();")
+        return cursor.fetchone()[0]
+
+def table_columns(conn, table):
+    """Column names of a public table, in table order"""
+    with conn.cursor() as cursor:
+        cursor.execute(
+            "SELECT column_name FROM information_schema.columns "
+            "WHERE table_schema = 'public' AND table_name = %s ORDER BY ordinal_position;",
+            (table,))
+        return [row[0] for row in cursor.fetchall()]
+
+def copy_table(source_cursor, target_cursor, table, columns, where=None):
+    """Pipe one table's rows (those matching where, if given) into the target; returns rows copied"""
+    columns_str = ', '.join(f'"{col}"' for col in columns)
+    select = f"SELECT {columns_str} FROM {table}" + (f" WHERE {where}" if where else '')
+    read_fd, write_fd = os.pipe()
+    reader = os.fdopen(read_fd, 'rb')
+    writer = os.fdopen(write_fd, 'wb')
+    source_errors = []
+
+    def produce():
+        try:
+            source_cursor.copy_expert(f"COPY ({select}) TO STDOUT", writer)
+        except Exception as e:
+            source_errors.append(e)
+        finally:
+            try:
+                writer.close()
+            except OSError:
+                # The target stopped reading; its own error is the one reported
+                pass
+
+    producer = threading.Thread(target=produce, daemon=True)
+    producer.start()
+    try:
+        target_cursor.copy_expert(f"COPY {table} ({columns_str}) FROM STDIN", reader, size=PIPE_READ_SIZE)
+    finally:
+        reader.close()
+        producer.join()
+
+    if source_errors:
+        raise source_errors[0]
+    return target_cursor.rowcount
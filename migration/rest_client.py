@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+Shared REST Client
+Keep-alive, gzip-enabled HTTP client for the Supabase/PostgREST API, used by
+migrate-api.py and verify-data.py instead of one urllib connection per request
+"""
+
+import re
+import gzip
+import json
+import time
+import codecs
+import threading
+import http.client
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+class HTTPError(Exception):
+    """Non-2xx response from the REST API"""
+
+    def __init__(self, code, reason, headers=None, body=b''):
+        super().__init__(f"HTTP Error {code}: {reason}")
+        self.code = code
+        self.reason = reason
+        self.headers = headers or {}
+        self.body = body
+
+    @property
+    def retry_after(self):
+        """Seconds to wait from a Retry-After header (seconds or an HTTP date), or None"""
+        value = self.headers.get('retry-after', '').strip()
+        if not value:
+            return None
+        if value.isdigit():
+            return float(value)
+        try:
+            return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+        except (TypeError, ValueError):
+            return None
+
+# Bytes read from a row response at a time, decompressed and decoded as they come
+READ_CHUNK = 64 * 1024
+
+WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+class JSONArrayDecoder:
+    """Decode a JSON array fed in byte chunks, returning each element once it has fully arrived"""
+
+    def __init__(self):
+        self._decoder = json.JSONDecoder()
+        self._text = codecs.getincrementaldecoder('utf-8')()
+        self._buffer = ''
+        # open: before '[', first: after '[', value: after ',', separator: after a value
+        self._state = 'open'
+
+    def feed(self, data):
+        """Decode the next chunk, returning the elements it completed"""
+        buffer = self._buffer + self._text.decode(data)
+        items = []
+        pos = 0
+        while True:
+            pos = WHITESPACE.match(buffer, pos).end()
+            if pos == len(buffer):
+                break
+            char = buffer[pos]
+            if self._state == 'closed':
+                raise ValueError(f"Extra data after JSON array at {pos}")
+            if self._state == 'open':
+                if char != '[':
+                    raise ValueError("Response is not a JSON array")
+                self._state = 'first'
+                pos += 1
+            elif self._state == 'separator' or (self._state == 'first' and char == ']'):
+                if char not in ',]':
+                    raise ValueError(f"Expected ',' or ']' in JSON array, got {char!r}")
+                self._state = 'value' if char == ',' else 'closed'
+                pos += 1
+            else:
+                # Rows are objects: decode all of them up to the last '},' in one
+                # call, or one at a time if that comma turns out to be in a string
+                cut = buffer.rfind('},', pos)
+                if cut > pos:
+                    try:
+                        items.extend(json.loads('[' + buffer[pos:cut + 1] + ']'))
+                        self._state = 'value'
+                        pos = cut + 2
+                        continue
+                    except json.JSONDecodeError:
+                        pass
+                try:
+                    item, end = self._decoder.raw_decode(buffer, pos)
+                except json.JSONDecodeError:
+                    # Most likely cut off mid-element; wait for the rest
+                    break
+                after = WHITESPACE.match(buffer, end).end()
+                if after == len(buffer) or buffer[after] not in ',]':
+                    # A number could still be continued by the next chunk
+                    break
+                items.append(item)
+                self._state = 'separator'
+                pos = after
+        self._buffer = buffer[pos:]
+        return items
+
+    def close(self):
+        """Check the array was complete"""
+        if self._state != 'closed' or self._buffer.strip() or self._text.decode(b'', final=True):
+            raise ValueError("Truncated or malformed JSON array")
+
+class RestClient:
+    """Pool of persistent HTTP(S) connections to one REST endpoint
+
+    Connections are checked out per request and returned afterwards, so any
+    number of worker threads can share one client; the pool grows to the
+    highest concurrency seen and those connections are reused from then on.
+    """
+
+    def __init__(self, base_url, api_key=None, timeout=30):
+        parts = urlsplit(base_url)
+        self.scheme = parts.scheme
+        self.host = parts.hostname
+        self.port = parts.port
+        self.base_path = parts.path.rstrip('/')
+        self.timeout = timeout
+        self.default_headers = {
+            'Accept': 'application/json',
+            'Accept-Encoding': 'gzip',
+            'Connection': 'keep-alive',
+        }
+        if api_key:
+            self.default_headers['apikey'] = api_key
+            self.default_headers['Authorization'] = f'Bearer {api_key}'
+        self._idle = []
+        self._lock = threading.Lock()
+        self.connections_opened = 0
+        self.bytes_received = 0
+
+    def _new_connection(self):
+        connection_class = (http.client.HTTPSConnection if self.scheme == 'https'
+                            else http.client.HTTPConnection)
+        with self._lock:
+            self.connections_opened += 1
+        return connection_class(self.host, self.port, timeout=self.timeout)
+
+    def _checkout(self):
+        with self._lock:
+            if self._idle:
+                return self._idle.pop(), True
+        return self._new_connection(), False
+
+    def _checkin(self, connection):
+        with self._lock:
+            self._idle.append(connection)
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for connection in idle:
+            connection.close()
+
+    def request(self, method, path, headers=None):
+        """Send a request and return (status, headers, decompressed body bytes)
+
+        Raises HTTPError for non-2xx responses. A pooled connection the server
+        has since closed is replaced and the request retried once.
+        """
+        def read(stream):
+            body = stream.read()
+            return body, len(body)
+
+        status, response_headers, (body, _) = self._send(method, path, headers, read)
+        return status, response_headers, body
+
+    def get_rows(self, path, headers=None):
+        """GET a JSON array, decoding rows as the body arrives
+
+        Returns (headers, rows, decompressed body size, seconds spent decoding),
+        so a page never sits in memory as raw bytes and rows at the same time.
+        """
+        decode_seconds = 0.0
+
+        def read(stream):
+            nonlocal decode_seconds
+            decoder = JSONArrayDecoder()
+            rows = []
+            size = 0
+            while True:
+                chunk = stream.read(READ_CHUNK)
+                if not chunk:
+                    break
+                size += len(chunk)
+                started = time.perf_counter()
+                rows.extend(decoder.feed(chunk))
+                decode_seconds += time.perf_counter() - started
+            if size:
+                decoder.close()
+            return rows, size
+
+        _, response_headers, (rows, size) = self._send('GET', path, headers, read)
+        return response_headers, rows, size, decode_seconds
+
+    def _send(self, method, path, headers, read):
+        """request() and get_rows(): read(stream) turns a 2xx body into (value, decompressed size)"""
+        all_headers = {**self.default_headers, **(headers or {})}
+        url = self.base_path + path
+
+        while True:
+            connection, reused = self._checkout()
+            try:
+                connection.request(method, url, headers=all_headers)
+                response = connection.getresponse()
+                response_headers = {key.lower(): value for key, value in response.getheaders()}
+                stream = response
+                if method != 'HEAD' and response_headers.get('content-encoding') == 'gzip':
+                    stream = gzip.GzipFile(fileobj=response)
+                if 200 <= response.status < 300:
+                    result = read(stream)
+                else:
+                    body = stream.read()
+                    result = body, len(body)
+            except (http.client.RemoteDisconnected, ConnectionResetError,
+                    BrokenPipeError, http.client.CannotSendRequest):
+                connection.close()
+                if reused:
+                    continue
+                raise
+            except Exception:
+                connection.close()
+                raise
+
+            with self._lock:
+                self.bytes_received += int(response_headers.get('content-length') or result[1])
+
+            if response.will_close:
+                connection.close()
+            else:
+                self._checkin(connection)
+
+            if not 200 <= response.status < 300:
+                raise HTTPError(response.status, response.reason, response_headers, result[0])
+            return response.status, response_headers, result
+
+    def get_json(self, path, headers=None):
+        """GET a path (relative to the base URL) and decode its JSON body; see get_rows for row pages"""
+        _, _, body = self.request('GET', path, headers)
+        return json.loads(body) if body else None
+
+    def count_rows(self, table, filters=''):
+        """Exact row count from a HEAD request, without transferring any rows
+
+        PostgREST answers Prefer: count=exact with a Content-Range header such
+        as 0-0/2329; filters is an optional query string like asof_date=gte.X.
+        """
+        path = f"/rest/v1/{table}?select=id&limit=1"
+        if filters:
+            path += '&' + filters
+        _, headers, _ = self.request('HEAD', path, {'Prefer': 'count=exact'})
+        content_range = headers.get('content-range', '')
+        if '/' not in content_range or content_range.endswith('/*'):
+            raise ValueError(f"No exact count in Content-Range: {content_range!r}")
+        return int(content_range.rsplit('/', 1)[1])
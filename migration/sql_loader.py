@@ -0,0 +1,365 @@
+#!/usr/bin/env python3
+"""
+SQL Export Loader
+Streams INSERT, COPY or ndjson export files into PostgreSQL in batches; callers commit
+"""
+
+import io
+import os
+import re
+import glob
+import gzip
+import json
+import time
+from itertools import islice
+
+import psycopg2
+
+# Rows sent per round trip by default
+INSERT_BATCH_SIZE = 1000
+COPY_BATCH_SIZE = 50000
+
+# Error messages kept per table for the caller to print
+MAX_ERRORS = 3
+
+class ImportStats:
+    """Rows loaded, rows rejected and server round trips for one table"""
+
+    def __init__(self, table):
+        self.table = table
+        self.rows = 0
+        self.failed = 0
+        self.errors = []
+        # psycopg2 sends BEGIN on its own before the first statement
+        self.round_trips = 1
+        self.started = time.perf_counter()
+        self.seconds = 0.0
+
+    def execute(self, cursor, sql):
+        cursor.execute(sql)
+        self.round_trips += 1
+
+    def finish(self):
+        self.seconds = time.perf_counter() - self.started
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    @property
+    def round_trips_per_10k(self):
+        return self.round_trips * 10000 / self.rows if self.rows else 0.0
+
+# File name of a table's export, by format
+NDJSON_SUFFIX = '.ndjson.gz'
+
+def export_file_name(table, export_format='insert', shard=None):
+    """<table>.sql, or <table>.ndjson.gz for ndjson; shard (index, count) adds .part01 and so on"""
+    if shard is not None:
+        table = f"{table}.part{shard[0] + 1:02d}"
+    return f"{table}{NDJSON_SUFFIX}" if export_format == 'ndjson' else f"{table}.sql"
+
+def table_export_files(export_dir, table):
+    """A table's export files in export_dir: its single file or its shards, in order"""
+    for suffix in ('.sql', NDJSON_SUFFIX):
+        path = f"{export_dir}/{table}{suffix}"
+        if os.path.exists(path):
+            return [path]
+        shards = sorted(glob.glob(f"{glob.escape(export_dir)}/{glob.escape(table)}.part[0-9]*{suffix}"))
+        if shards:
+            return shards
+    return []
+
+def copy_escape(value):
+    """Convert a JSON value to a COPY text-format field"""
+    if value is None:
+        return '\\N'
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if isinstance(value, (int, float)):
+        return str(value)
+    if isinstance(value, (dict, list)):
+        value = json.dumps(value)
+    return (str(value)
+            .replace('\\', '\\\\')
+            .replace('\t', '\\t')
+            .replace('\n', '\\n')
+            .replace('\r', '\\r'))
+
+# A whole quoted string, E'' string with backslash escapes, $$ dollar quote
+# or quoted identifier; a doubled '' reads as two strings in a row
+QUOTED = r"""'[^']*'|"[^"]*"|(?<![\w$])[Ee]'(?:[^'\\]|\\.)*'|(?<![\w$])(?P<tag>\$(?:[A-Za-z_]\w*)?\$).*?(?P=tag)"""
+# The opening token of a quote that does not end in the text scanned
+QUOTE_OPENER = r"""(?<![\w$])[Ee]'|['"]|(?<![\w$])\$(?:[A-Za-z_]\w*)?\$"""
+
+# Each pattern starts with a lookahead on its first characters, which lets
+# the scan skip plain text almost as fast as a single character class
+STATEMENT_TOKENS = re.compile(
+    rf"""(?=[-'";/$Ee])(?:(?P<quoted>{QUOTED})|(?P<comment>--[^\n]*(?=\n))"""
+    rf"""|(?P<opener>{QUOTE_OPENER}|--|/\*)|;)""", re.DOTALL)
+VALUES_TOKENS = re.compile(
+    rf"""(?=['"$Ee()])(?:(?P<quoted>{QUOTED})|(?P<opener>{QUOTE_OPENER})|[()])""", re.DOTALL)
+INSERT_PREFIX = re.compile(r'INSERT INTO \S+ \([^()]*\) VALUES \(', re.IGNORECASE)
+
+# What ends a quote or comment that runs past the end of a read; E'' strings
+# also skip backslash escapes
+CLOSING_TOKENS = {
+    "'": re.compile("'"),
+    '"': re.compile('"'),
+    "E'": re.compile(r"\\.|'", re.DOTALL),
+    '--': re.compile('\n'),
+    '/*': re.compile(r'/\*|\*/'),
+}
+
+# Longest token that can straddle two reads: a dollar-quote tag is at most
+# 63 characters, plus its two dollar signs and the character before
+TOKEN_LOOKBACK = 66
+
+def closing_pattern(opener):
+    """Pattern for the token that ends a quote or comment opened with opener"""
+    if opener.startswith('$'):
+        return re.compile(re.escape(opener))
+    return CLOSING_TOKENS[opener.upper()]
+
+def iter_statements(f, chunk_size=1 << 16):
+    """Yield a file's SQL statements one at a time, splitting on semicolons outside quotes and comments"""
+    pieces = []
+    buffer = ''
+    # Start of the current statement's text in buffer; None inside a comment
+    start = 0
+    pos = 0
+    # The quote or comment left open at the end of a read, and what closes it
+    opener = None
+    closing = None
+    depth = 0
+
+    for chunk in iter(lambda: f.read(chunk_size), ''):
+        buffer += chunk
+
+        while True:
+            match = (closing or STATEMENT_TOKENS).search(buffer, pos)
+            if not match:
+                break
+            pos = match.end()
+
+            if opener is None:
+                kind = match.lastgroup
+                if kind == 'quoted':
+                    continue
+                if kind == 'comment':
+                    # Keep the newline that ends the comment
+                    pieces.append(buffer[start:match.start()])
+                    start = pos
+                    continue
+                if kind == 'opener':
+                    opener = match.group()
+                    closing = closing_pattern(opener)
+                    if opener in ('--', '/*'):
+                        pieces.append(buffer[start:match.start()])
+                        start = None
+                        depth = 1
+                    continue
+                statement = (''.join(pieces) + buffer[start:match.start()]).strip()
+                if statement:
+                    yield statement
+                pieces = []
+                start = pos
+                continue
+
+            token = match.group()
+            if opener == '/*':
+                # Block comments nest
+                depth += 1 if token == '/*' else -1
+                if depth == 0:
+                    pieces.append(' ')
+                    start = pos
+                    opener = closing = None
+            elif opener == '--':
+                start = match.start()
+                opener = closing = None
+            elif token == "'" or opener[0] not in 'Ee':
+                opener = closing = None
+
+        # Keep the unscanned tail, where a token may be cut in half, plus one
+        # character of context for the lookbehinds; move the rest of the
+        # statement into pieces
+        resume = max(pos, len(buffer) - TOKEN_LOOKBACK)
+        keep = max(0, resume - 1)
+        if start is not None:
+            if start < keep:
+                pieces.append(buffer[start:keep])
+                start = 0
+            else:
+                start -= keep
+        buffer = buffer[keep:]
+        pos = resume - keep
+
+    statement = ''.join(pieces) + (buffer[start:] if start is not None else '')
+    statement = statement.strip()
+    if statement:
+        yield statement
+
+def split_insert(statement):
+    """Split a single-row INSERT into (prefix, values tuple, suffix), or None for other statements"""
+    match = INSERT_PREFIX.match(statement)
+    if not match:
+        return None
+
+    depth = 1
+    for token in VALUES_TOKENS.finditer(statement, match.end()):
+        kind = token.lastgroup
+        if kind == 'quoted':
+            continue
+        if kind == 'opener':
+            # A quote that never closes
+            return None
+        if token.group() == '(':
+            depth += 1
+        else:
+            depth -= 1
+            if depth == 0:
+                tuple_start = match.end() - 1
+                return (statement[:tuple_start], statement[tuple_start:token.end()],
+                        statement[token.end():])
+    return None
+
+class CopyBlockReader:
+    """File-like reader over a COPY data block that stops at the \\. marker"""
+
+    def __init__(self, f):
+        self.f = f
+        self.done = False
+        self.buffer = ''
+
+    def readline(self, size=-1):
+        if self.done:
+            return ''
+        line = self.f.readline()
+        if line.rstrip('\r\n') == '\\.':
+            self.done = True
+            return ''
+        return line
+
+    def read(self, size=-1):
+        while not self.done and (size < 0 or len(self.buffer) < size):
+            line = self.readline()
+            if not line:
+                break
+            self.buffer += line
+        if size < 0:
+            size = len(self.buffer)
+        data, self.buffer = self.buffer[:size], self.buffer[size:]
+        return data
+
+def is_copy_export(sql_file):
+    """Check whether an export file was written with --format=copy"""
+    with open(sql_file, 'r', encoding='utf-8', newline='') as f:
+        return f.readline().startswith('COPY ')
+
+SAVEPOINT = 'import_batch'
+
+def load_batch(cursor, stats, items, send, isolate_errors=True):
+    """Load a batch with send(items), bisecting it down to the rows the server rejects if it fails"""
+    try:
+        send(items)
+        stats.rows += len(items)
+    except psycopg2.Error as e:
+        if not isolate_errors:
+            raise
+        stats.execute(cursor, f"ROLLBACK TO SAVEPOINT {SAVEPOINT}; RELEASE SAVEPOINT {SAVEPOINT}")
+        if len(items) > 1:
+            middle = len(items) // 2
+            load_batch(cursor, stats, items[:middle], send)
+            load_batch(cursor, stats, items[middle:], send)
+            return
+        stats.failed += 1
+        if len(stats.errors) < MAX_ERRORS:
+            stats.errors.append(str(e).strip())
+
+def load_sql_file(cursor, f, stats, batch_size=INSERT_BATCH_SIZE, isolate_errors=True):
+    """Load an INSERT-format export, merging consecutive single-row INSERTs into multi-row ones"""
+    pending = []
+    shape = None
+
+    def wrap(sql):
+        if not isolate_errors:
+            return sql
+        return f"SAVEPOINT {SAVEPOINT}; {sql}; RELEASE SAVEPOINT {SAVEPOINT}"
+
+    def send_inserts(tuples):
+        prefix, suffix = shape
+        stats.execute(cursor, wrap(f"{prefix}{','.join(tuples)}{suffix}"))
+
+    def send_statement(statements):
+        stats.execute(cursor, wrap(statements[0]))
+
+    for statement in iter_statements(f):
+        parts = split_insert(statement)
+
+        if parts is None or (parts[0], parts[2]) != shape or len(pending) >= batch_size:
+            if pending:
+                load_batch(cursor, stats, pending, send_inserts, isolate_errors)
+            pending = []
+            shape = None
+
+        if parts is None:
+            load_batch(cursor, stats, [statement], send_statement, isolate_errors)
+            continue
+
+        shape = (parts[0], parts[2])
+        pending.append(parts[1])
+
+    if pending:
+        load_batch(cursor, stats, pending, send_inserts, isolate_errors)
+
+def copy_sender(cursor, stats, copy_sql, isolate_errors=True):
+    """send() for load_batch: one COPY of a batch of text-format lines"""
+    def send_copy(lines):
+        if isolate_errors:
+            stats.execute(cursor, f"SAVEPOINT {SAVEPOINT}")
+        cursor.copy_expert(copy_sql, io.StringIO(''.join(lines)))
+        stats.round_trips += 1
+        if isolate_errors:
+            stats.execute(cursor, f"RELEASE SAVEPOINT {SAVEPOINT}")
+    return send_copy
+
+def load_copy_file(cursor, f, stats, batch_size=COPY_BATCH_SIZE, isolate_errors=True):
+    """Load a COPY-format export, one COPY per batch of data lines"""
+    copy_sql = f.readline().strip().rstrip(';')
+    reader = CopyBlockReader(f)
+    send_copy = copy_sender(cursor, stats, copy_sql, isolate_errors)
+
+    while True:
+        lines = list(islice(iter(reader.readline, ''), batch_size))
+        if not lines:
+            break
+        load_batch(cursor, stats, lines, send_copy, isolate_errors)
+
+def load_ndjson_file(cursor, f, stats, batch_size=COPY_BATCH_SIZE, isolate_errors=True):
+    """Load an ndjson export, converting its rows straight to COPY batches"""
+    header = json.loads(f.readline())
+    columns_str = ', '.join(f'"{col}"' for col in header['columns'])
+    copy_sql = f"COPY {header['table']} ({columns_str}) FROM stdin"
+    send_copy = copy_sender(cursor, stats, copy_sql, isolate_errors)
+
+    lines = (
+        '\t'.join(copy_escape(value) for value in json.loads(line)) + '\n'
+        for line in f if line.strip()
+    )
+    while True:
+        batch = list(islice(lines, batch_size))
+        if not batch:
+            break
+        load_batch(cursor, stats, batch, send_copy, isolate_errors)
+
+def load_export_file(cursor, sql_file, stats, batch_size=None, isolate_errors=True):
+    """Load an export file of any format; batch_size None means the format's default"""
+    if sql_file.endswith(NDJSON_SUFFIX):
+        with gzip.open(sql_file, 'rt', encoding='utf-8', newline='') as f:
+            load_ndjson_file(cursor, f, stats, batch_size or COPY_BATCH_SIZE, isolate_errors)
+    elif is_copy_export(sql_file):
+        with open(sql_file, 'r', encoding='utf-8', newline='') as f:
+            load_copy_file(cursor, f, stats, batch_size or COPY_BATCH_SIZE, isolate_errors)
+    else:
+        with open(sql_file, 'r', encoding='utf-8', newline='') as f:
+            load_sql_file(cursor, f, stats, batch_size or INSERT_BATCH_SIZE, isolate_errors)
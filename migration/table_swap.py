@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+"""
+Shadow Table Swap
+Loads a table into a shadow copy and swaps it in with one short transaction, for import --swap and rollback
+"""
+
+import time
+
+import psycopg2
+
+SHADOW_SCHEMA = 'import_shadow'
+BACKUP_SCHEMA = 'import_backup'
+
+# The swap takes its locks with NOWAIT, retrying every SWAP_LOCK_RETRY
+# seconds for up to SWAP_LOCK_SECONDS. It never waits while holding a lock,
+# so readers never queue behind it or deadlock with it, and a long-running
+# query makes the swap give up rather than stall the table
+SWAP_LOCK_SECONDS = 10.0
+SWAP_LOCK_RETRY = 0.05
+
+def rows(conn, sql, params=None):
+    with conn.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall() if cursor.description else []
+
+def quote_ident(name):
+    return '"' + name.replace('"', '""') + '"'
+
+def table_exists(conn, schema, table):
+    return rows(conn, "SELECT to_regclass(%s) IS NOT NULL;", (f'{schema}.{table}',))[0][0]
+
+def dependent_views(conn, table):
+    """Views and materialized views that read public.table; a swap would leave them on the backup"""
+    return [row[0] for row in rows(conn,
+        "SELECT DISTINCT v.oid::regclass::text FROM pg_depend d "
+        "JOIN pg_rewrite r ON r.oid = d.objid JOIN pg_class v ON v.oid = r.ev_class "
+        "WHERE d.refobjid = %s::regclass AND v.oid <> d.refobjid;",
+        (f'public.{table}',))]
+
+def foreign_keys(conn, table, incoming=False):
+    """(table, name, definition) of the foreign keys of public.table, or those referencing it"""
+    root = "COALESCE(pg_partition_root(c.conrelid), c.conrelid)"
+    column = 'c.confrelid' if incoming else root
+    return [tuple(row) for row in rows(conn,
+        f"SELECT DISTINCT {root}::regclass::text, c.conname, "
+        "regexp_replace(pg_get_constraintdef(c.oid), ' NOT VALID$', '') FROM pg_constraint c "
+        f"WHERE {column} = %s::regclass AND c.contype = 'f' AND {root} <> c.confrelid "
+        "AND c.conparentid = 0 ORDER BY 1, 2;",
+        (f'public.{table}',))]
+
+def has_foreign_key(conn, table, name):
+    """Whether table (regclass text) exists and has a foreign key of this name"""
+    return rows(conn,
+        "SELECT EXISTS (SELECT 1 FROM pg_constraint WHERE conrelid = to_regclass(%s) "
+        "AND conname = %s AND contype = 'f');",
+        (table, name))[0][0]
+
+def partitions(conn, schema, table):
+    """Names of the partitions attached to schema.table, [] if it is not partitioned"""
+    return [row[0] for row in rows(conn,
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = %s::regclass ORDER BY c.relname;",
+        (f'{schema}.{table}',))]
+
+def leaf_partitions(conn, table):
+    """The partitions of a partitioned table that hold rows, as regclass text"""
+    return [row[0] for row in rows(conn,
+        "SELECT relid::regclass::text FROM pg_partition_tree(%s::regclass) WHERE isleaf ORDER BY 1;",
+        (table,))]
+
+def partition_key(conn, schema, table):
+    """The column schema.table is partitioned by, or None if it is not partitioned"""
+    found = rows(conn,
+        "SELECT a.attname FROM pg_partitioned_table p "
+        "JOIN pg_attribute a ON a.attrelid = p.partrelid AND a.attnum = p.partattrs[0] "
+        "WHERE p.partrelid = to_regclass(%s);",
+        (f'{schema}.{table}',))
+    return found[0][0] if found else None
+
+def key_with_column(definition, column):
+    """A PRIMARY KEY or UNIQUE definition with column added to its key columns, as a partitioned table needs"""
+    start = definition.index('(') + 1
+    end = definition.index(')', start)
+    if column in [name.strip().strip('"') for name in definition[start:end].split(',')]:
+        return definition
+    return f"{definition[:end]}, {quote_ident(column)}{definition[end:]}"
+
+def drop_table(conn, schema, table):
+    with conn.cursor() as cursor:
+        cursor.execute(f"DROP TABLE IF EXISTS {schema}.{table};")
+
+def create_shadow_table(conn, table, partition_by=None):
+    """Create an empty, unindexed SHADOW_SCHEMA.table like public.table, range partitioned on partition_by if given"""
+    shadow = f'{SHADOW_SCHEMA}.{table}'
+    with conn.cursor() as cursor:
+        cursor.execute(f"CREATE SCHEMA IF NOT EXISTS {SHADOW_SCHEMA};")
+        cursor.execute(f"DROP TABLE IF EXISTS {shadow};")
+        if partition_by:
+            cursor.execute(f"CREATE TABLE {shadow} (LIKE public.{table} INCLUDING ALL EXCLUDING INDEXES) "
+                           f"PARTITION BY RANGE ({quote_ident(partition_by)});")
+            # Rows without a value are rejected as they load, not when the key is built
+            cursor.execute(f"ALTER TABLE {shadow} ALTER COLUMN {quote_ident(partition_by)} SET NOT NULL;")
+            cursor.execute(f"CREATE TABLE {SHADOW_SCHEMA}.{table}_default PARTITION OF {shadow} DEFAULT;")
+        else:
+            cursor.execute(f"CREATE TABLE {shadow} (LIKE public.{table} INCLUDING ALL EXCLUDING INDEXES);")
+
+def build_shadow_table(conn, table):
+    """Give the loaded shadow public.table's constraints, indexes, foreign keys, triggers, policies and grants"""
+    live = f'public.{table}'
+    shadow = f'{SHADOW_SCHEMA}.{table}'
+
+    constraints = rows(conn,
+        "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+        "WHERE conrelid = %s::regclass AND contype IN ('p', 'u', 'x') ORDER BY contype, conname;",
+        (live,))
+    indexes = rows(conn,
+        "SELECT pg_get_indexdef(x.indexrelid) FROM pg_index x "
+        "WHERE x.indrelid = %s::regclass "
+        "AND NOT EXISTS (SELECT 1 FROM pg_constraint c WHERE c.conindid = x.indexrelid);",
+        (live,))
+    triggers = rows(conn,
+        "SELECT pg_get_triggerdef(oid) FROM pg_trigger WHERE tgrelid = %s::regclass AND NOT tgisinternal;",
+        (live,))
+    policies = rows(conn,
+        "SELECT policyname, permissive, roles::text[], cmd, qual, with_check FROM pg_policies "
+        "WHERE schemaname = 'public' AND tablename = %s;",
+        (table,))
+    grants = rows(conn,
+        "SELECT CASE WHEN a.grantee = 0 THEN 'PUBLIC' ELSE quote_ident(r.rolname) END, "
+        "a.privilege_type, a.is_grantable "
+        "FROM pg_class c CROSS JOIN LATERAL aclexplode(c.relacl) a "
+        "LEFT JOIN pg_roles r ON r.oid = a.grantee "
+        "WHERE c.oid = %s::regclass AND a.grantee <> c.relowner;",
+        (live,))
+    partition_by = partition_key(conn, SHADOW_SCHEMA, table)
+    owner, row_security, force_row_security = rows(conn,
+        "SELECT relowner::regrole::text, relrowsecurity, relforcerowsecurity FROM pg_class "
+        "WHERE oid = %s::regclass;",
+        (live,))[0]
+
+    # pg_get_indexdef and pg_get_triggerdef name the table schema-qualified,
+    # as ON ONLY for the indexes of a partitioned table
+    on_live = f" ON {live} "
+    on_shadow = f" ON {shadow} "
+
+    with conn.cursor() as cursor:
+        for name, definition in constraints:
+            if partition_by and not definition.startswith('EXCLUDE'):
+                definition = key_with_column(definition, partition_by)
+            cursor.execute(f"ALTER TABLE {shadow} ADD CONSTRAINT {quote_ident(name)} {definition};")
+        for (definition,) in indexes:
+            definition = definition.replace(f" ON ONLY {live} ", on_live, 1)
+            cursor.execute(definition.replace(on_live, on_shadow, 1) + ';')
+
+        for _, name, definition in foreign_keys(conn, table):
+            # A partitioned table cannot take a NOT VALID foreign key
+            if partition_by:
+                cursor.execute(f"ALTER TABLE {shadow} ADD CONSTRAINT {quote_ident(name)} {definition};")
+                continue
+            cursor.execute(f"ALTER TABLE {shadow} ADD CONSTRAINT {quote_ident(name)} {definition} NOT VALID;")
+            cursor.execute(f"ALTER TABLE {shadow} VALIDATE CONSTRAINT {quote_ident(name)};")
+
+        for (definition,) in triggers:
+            cursor.execute(definition.replace(on_live, on_shadow, 1) + ';')
+
+        if row_security:
+            cursor.execute(f"ALTER TABLE {shadow} ENABLE ROW LEVEL SECURITY;")
+        if force_row_security:
+            cursor.execute(f"ALTER TABLE {shadow} FORCE ROW LEVEL SECURITY;")
+        for name, permissive, roles, command, qual, with_check in policies:
+            to = ', '.join('PUBLIC' if role == 'public' else quote_ident(role) for role in roles)
+            cursor.execute(f"CREATE POLICY {quote_ident(name)} ON {shadow} AS {permissive} FOR {command} TO {to}"
+                           + (f" USING ({qual})" if qual else '')
+                           + (f" WITH CHECK ({with_check})" if with_check else '') + ';')
+
+        for grantee, privilege, grantable in grants:
+            cursor.execute(f"GRANT {privilege} ON {shadow} TO {grantee}"
+                           + (" WITH GRANT OPTION;" if grantable else ';'))
+
+        cursor.execute("SELECT current_user;")
+        if cursor.fetchone()[0] != owner:
+            cursor.execute(f"ALTER TABLE {shadow} OWNER TO {owner};")
+
+        cursor.execute(f"ANALYZE {shadow};")
+
+def add_foreign_key(cursor, table, name, definition, leaves=None):
+    """Add a foreign key NOT VALID, on each of leaves for a partitioned table; returns the steps left to validate"""
+    if leaves is None:
+        cursor.execute(f"ALTER TABLE {table} ADD CONSTRAINT {quote_ident(name)} {definition} NOT VALID;")
+        return [(table, name)]
+    for leaf in leaves:
+        cursor.execute(f"ALTER TABLE {leaf} ADD CONSTRAINT {quote_ident(name)} {definition} NOT VALID;")
+    return [(leaf, name) for leaf in leaves] + [(table, name, definition)]
+
+def drop_foreign_key(cursor, table, name):
+    """Drop a foreign key from table, or from each of its partitions that holds it on its own"""
+    cursor.execute("SELECT conrelid::regclass::text FROM pg_constraint "
+                   "WHERE conname = %s AND contype = 'f' AND conparentid = 0 AND (conrelid = %s::regclass "
+                   "OR conrelid IN (SELECT relid FROM pg_partition_tree(%s::regclass)));",
+                   (name, table, table))
+    for (holder,) in cursor.fetchall():
+        cursor.execute(f"ALTER TABLE {holder} DROP CONSTRAINT {quote_ident(name)};")
+
+def swap_tables(conn, table, source_schema, backup_schema):
+    """Swap source_schema.table in as public.table in one transaction, moving the live one to backup_schema"""
+    live = f'public.{table}'
+    incoming = foreign_keys(conn, table, incoming=True)
+    outgoing = foreign_keys(conn, table)
+    sequences = rows(conn,
+        "SELECT s.oid::regclass::text, a.attname FROM pg_depend d "
+        "JOIN pg_class s ON s.oid = d.objid AND s.relkind = 'S' "
+        "JOIN pg_attribute a ON a.attrelid = d.refobjid AND a.attnum = d.refobjsubid "
+        "WHERE d.refobjid = %s::regclass AND d.deptype = 'a';",
+        (live,))
+    present = {row[0] for row in rows(conn,
+        "SELECT conname FROM pg_constraint WHERE conrelid = %s::regclass AND contype = 'f';",
+        (f'{source_schema}.{table}',))}
+    self_references = rows(conn,
+        "SELECT conname, regexp_replace(pg_get_constraintdef(oid), ' NOT VALID$', '') FROM pg_constraint "
+        "WHERE conrelid = %s::regclass AND confrelid = conrelid AND contype = 'f';",
+        (live,))
+    parents = [row[0] for row in rows(conn,
+        "SELECT DISTINCT confrelid::regclass::text FROM pg_constraint "
+        "WHERE conrelid = %s::regclass AND contype = 'f' AND conrelid <> confrelid;",
+        (live,))]
+    live_partitions = partitions(conn, 'public', table)
+    source_partitions = partitions(conn, source_schema, table)
+    # The new table's partitions are in public once it is
+    new_leaves = [f'public.{name}' for name in source_partitions] \
+        if partition_key(conn, source_schema, table) else None
+    partitioned = {row[0] for row in rows(conn, "SELECT partrelid::regclass::text FROM pg_partitioned_table;")}
+    child_leaves = {child: leaf_partitions(conn, child) for child, _, _ in incoming if child in partitioned}
+    conn.rollback()
+
+    # Every table whose constraints change, so nothing waits once the swap starts
+    locked = [live, f'{source_schema}.{table}'] + sorted({child for child, _, _ in incoming} | set(parents))
+    # Trading places needs somewhere to park the live table in between
+    parking = backup_schema if backup_schema != source_schema else f"{backup_schema}_swap"
+
+    to_validate = []
+    try:
+        with conn.cursor() as cursor:
+            deadline = time.monotonic() + SWAP_LOCK_SECONDS
+            while True:
+                try:
+                    cursor.execute(f"LOCK TABLE {', '.join(locked)} IN ACCESS EXCLUSIVE MODE NOWAIT;")
+                    break
+                except psycopg2.errors.LockNotAvailable:
+                    conn.rollback()
+                    if time.monotonic() > deadline:
+                        raise
+                    time.sleep(SWAP_LOCK_RETRY)
+            cursor.execute(f"CREATE SCHEMA IF NOT EXISTS {parking};")
+
+            for child, name, _ in incoming:
+                drop_foreign_key(cursor, child, name)
+            for sequence, _ in sequences:
+                cursor.execute(f"ALTER SEQUENCE {sequence} OWNED BY NONE;")
+
+            # SET SCHEMA does not move a table's partitions
+            for moved in [table] + live_partitions:
+                cursor.execute(f"ALTER TABLE public.{moved} SET SCHEMA {parking};")
+            for moved in [table] + source_partitions:
+                cursor.execute(f"ALTER TABLE {source_schema}.{moved} SET SCHEMA public;")
+            if parking != backup_schema:
+                for moved in [table] + live_partitions:
+                    cursor.execute(f"ALTER TABLE {parking}.{moved} SET SCHEMA {backup_schema};")
+                cursor.execute(f"DROP SCHEMA {parking};")
+
+            for _, name, _ in outgoing:
+                drop_foreign_key(cursor, f'{backup_schema}.{table}', name)
+            # A backup keeps foreign keys to itself; the new table gets its own
+            for _, name, definition in outgoing + [(table, name, definition) for name, definition in self_references]:
+                if name not in present:
+                    to_validate += add_foreign_key(cursor, live, name, definition, new_leaves)
+            for child, name, definition in incoming:
+                to_validate += add_foreign_key(cursor, child, name, definition, child_leaves.get(child))
+            for sequence, column in sequences:
+                cursor.execute(f"ALTER SEQUENCE {sequence} OWNED BY {live}.{quote_ident(column)};")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return to_validate
+
+def validate_foreign_keys(conn, constraints):
+    """VALIDATE each foreign key; returns {(table, name): error} for those that do not hold"""
+    constraints = list(dict.fromkeys(constraints))
+    failed = {}
+    with conn.cursor() as cursor:
+        for table, name, *definition in ([c for c in constraints if len(c) == 2]
+                                         + [c for c in constraints if len(c) == 3]):
+            # Gone with a swapped-out table, or already added
+            if has_foreign_key(conn, table, name) == bool(definition):
+                continue
+            try:
+                if definition:
+                    cursor.execute(f"ALTER TABLE {table} ADD CONSTRAINT {quote_ident(name)} {definition[0]};")
+                else:
+                    cursor.execute(f"ALTER TABLE {table} VALIDATE CONSTRAINT {quote_ident(name)};")
+            except psycopg2.Error as e:
+                failed[(table, name)] = str(e).strip()
+    return failed
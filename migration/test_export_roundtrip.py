@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Export Round-Trip Test
+Writes rows with awkward text through every export format and loads them
+back with load_export_file, checking each value arrives byte for byte
+
+Needs a scratch PostgreSQL database given by BENCH_DSN, like the load
+benchmarks; the test is skipped when it cannot connect.
+
+    BENCH_DSN="host=localhost port=5432 dbname=karat_bench user=postgres" \
+        python migration/test_export_roundtrip.py
+"""
+
+import gzip
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import benchmark
+from sql_loader import ImportStats, load_export_file, export_file_name
+
+TABLE = 'roundtrip_text'
+
+VALUES = [
+    'line1\r\nline2',
+    'line1\rline2',
+    'line1\nline2',
+    'col1\tcol2',
+    'back\\slash \\N \\.',
+    "quote ' and \"double\"",
+    'trailing\r\n',
+]
+
+class ExportRoundTripTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        try:
+            import psycopg2
+            cls.conn = psycopg2.connect(benchmark.BENCH_DSN, connect_timeout=5)
+        except Exception as e:
+            raise unittest.SkipTest(f"no benchmark database ({e})")
+        cls.conn.autocommit = True
+        with cls.conn.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {TABLE}")
+            cursor.execute(f"CREATE TABLE {TABLE} (id uuid PRIMARY KEY, body text, doc jsonb)")
+
+        with benchmark.bench_workspace():
+            cls.api = benchmark.load_migrate_api()
+
+    @classmethod
+    def tearDownClass(cls):
+        with cls.conn.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {TABLE}")
+        cls.conn.close()
+
+    def rows(self):
+        return [{'id': f'00000000-0000-0000-0000-{i:012d}', 'body': value, 'doc': {'text': value}}
+                for i, value in enumerate(VALUES)]
+
+    def write_export(self, directory, export_format):
+        """Write the rows as export_table would, in two pages"""
+        api = self.api
+        rows = self.rows()
+        path = os.path.join(directory, export_file_name(TABLE, export_format))
+        column_types = {'id': 'uuid', 'body': 'text', 'doc': 'jsonb'} if export_format == 'insert' else None
+        columns, schema = None, {}
+        with open(path, 'wb') as f:
+            for page in (rows[:3], rows[3:]):
+                text, columns = api.page_text(TABLE, export_format, page, columns, schema, column_types)
+                chunk = text.encode('utf-8')
+                f.write(gzip.compress(chunk) if export_format == 'ndjson' else chunk)
+            if export_format == 'copy':
+                f.write(api.COPY_END.encode('utf-8'))
+        return path
+
+    def test_every_format_keeps_text_unchanged(self):
+        for export_format in self.api.EXPORT_FORMATS:
+            with self.subTest(export_format=export_format), benchmark.bench_workspace() as directory:
+                path = self.write_export(directory, export_format)
+                # Loaded in one transaction, as import does
+                self.conn.autocommit = False
+                try:
+                    with self.conn.cursor() as cursor:
+                        cursor.execute(f"TRUNCATE {TABLE}")
+                        stats = ImportStats(TABLE)
+                        load_export_file(cursor, path, stats, isolate_errors=False)
+                    self.conn.commit()
+                finally:
+                    self.conn.autocommit = True
+                self.assertEqual(stats.failed, 0)
+                with self.conn.cursor() as cursor:
+                    cursor.execute(f"SELECT id::text, body, doc FROM {TABLE} ORDER BY id")
+                    loaded = [{'id': id_, 'body': body, 'doc': doc} for id_, body, doc in cursor.fetchall()]
+                self.assertEqual(loaded, self.rows())
+
+if __name__ == '__main__':
+    unittest.main()
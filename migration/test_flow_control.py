@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Flow Control Test
+Checks that FlowController grows pages additively while they come back in
+time and cuts page size and requests in flight when the source pushes back
+
+Needs no database.
+
+    python migration/test_flow_control.py
+"""
+
+import os
+import sys
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from flow_control import FlowController, Throttle
+
+class FlowControllerTest(unittest.TestCase):
+
+    def controller(self, **options):
+        return FlowController(**{'page_size': 1000, 'min_page_size': 100, 'max_page_size': 5000,
+                                 'max_in_flight': 8, 'target_seconds': 2.0, **options})
+
+    def test_fast_full_pages_grow_up_to_the_maximum(self):
+        flow = self.controller()
+        sizes = []
+        for _ in range(12):
+            limit = flow.page_size
+            flow.record(0.5, limit, limit * 100, limit)
+            sizes.append(flow.page_size)
+        self.assertEqual(sizes[:3], [1250, 1562, 1953])
+        self.assertEqual(sizes[-1], 5000)
+
+    def test_slow_or_large_pages_shrink(self):
+        flow = self.controller()
+        flow.record(3.0, 1000, 100000, 1000)
+        self.assertEqual(flow.page_size, 750)
+        flow.record(0.5, 750, 9 * 1024 * 1024, 750)
+        self.assertEqual(flow.page_size, 562)
+
+    def test_short_pages_leave_the_size_alone(self):
+        flow = self.controller()
+        flow.record(0.1, 10, 1000, 1000)
+        self.assertEqual(flow.page_size, 1000)
+
+    def test_throttling_halves_size_and_in_flight(self):
+        flow = self.controller()
+        flow.throttled()
+        self.assertEqual((flow.page_size, flow.in_flight), (500, 4))
+        for _ in range(5):
+            flow.throttled()
+        self.assertEqual((flow.page_size, flow.in_flight), (100, 1))
+        self.assertEqual(flow.throttled_count, 6)
+
+    def test_in_flight_climbs_back_one_per_window(self):
+        flow = self.controller()
+        for _ in range(3):
+            flow.throttled()
+        self.assertEqual(flow.in_flight, 1)
+        for _ in range(4):
+            flow.record(0.5, 50, 5000, 1000)
+        # +1/in_flight per page: 1 -> 2 -> 2.5 -> 2.9 -> 3.24
+        self.assertEqual(flow.in_flight, 3)
+
+    def test_rising_latency_drops_one_request(self):
+        flow = self.controller()
+        flow.record(0.5, 1000, 100000, 1000)
+        flow.record(1.5, 1000, 100000, 1000)
+        self.assertEqual(flow.in_flight, 7)
+
+    def test_cap_holds_pages_to_the_source_limit(self):
+        flow = self.controller()
+        flow.cap(500)
+        self.assertEqual(flow.page_size, 500)
+        for _ in range(5):
+            flow.record(0.1, 500, 50000, 500)
+        self.assertEqual(flow.page_size, 500)
+
+class ThrottleTest(unittest.TestCase):
+
+    def test_hold_delays_waiters(self):
+        throttle = Throttle()
+        throttle.hold(0.2)
+        throttle.hold(0.05)
+        started = time.monotonic()
+        throttle.wait()
+        self.assertGreaterEqual(time.monotonic() - started, 0.15)
+
+if __name__ == '__main__':
+    unittest.main()
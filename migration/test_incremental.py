@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Incremental Sync Test
+Checks that sync_table upserts a row written to mid-scan once in the
+delta script and again, with its latest copy, after it
+
+The REST pages and the target connection are stand-ins; needs no database.
+
+    python migration/test_incremental.py
+"""
+
+import contextlib
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import benchmark
+
+def row(key, created_at, item_name):
+    return {'id': f'00000000-0000-0000-0000-{key:012d}', 'created_at': created_at, 'item_name': item_name}
+
+class RecordingCursor:
+
+    def __init__(self, statements):
+        self.statements = statements
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=None):
+        self.statements.append(sql)
+
+class RecordingConnection:
+
+    def __init__(self):
+        self.statements = []
+        self.commits = 0
+
+    def cursor(self):
+        return RecordingCursor(self.statements)
+
+    def commit(self):
+        self.commits += 1
+
+class SyncTableTest(unittest.TestCase):
+
+    def sync(self, pages, state):
+        """Run sync_table over pages of changed rows; returns (result, target connection)"""
+        conn = RecordingConnection()
+        with benchmark.bench_workspace({'TABLES': 'expense_log'}) as workdir:
+            api = benchmark.load_migrate_api()
+            api.iter_supabase_changes = lambda table, column, since=None, **options: iter(pages)
+            api.target_column_types = lambda tables: {table: None for table in tables}
+            api.target_partitioned_tables = lambda tables: set()
+            api.target_connection = contextlib.contextmanager(lambda autocommit=False: iter([conn]))
+            with benchmark.quiet():
+                result = api.sync_table('expense_log', state, workdir)
+        return result, conn
+
+    def test_row_changed_mid_scan_is_applied_last_with_its_latest_copy(self):
+        pages = [
+            [row(1, '2024-01-01T00:00:00+00:00', 'first'), row(2, '2024-01-01T00:00:01+00:00', 'other')],
+            [row(3, '2024-01-02T00:00:00+00:00', 'new'), row(1, '2024-01-03T00:00:00+00:00', 'edited')],
+        ]
+        state = {}
+        ok, conn = self.sync(pages, state)
+
+        self.assertTrue(ok)
+        self.assertEqual(conn.commits, 1)
+        script = '\n'.join(conn.statements)
+        # No statement may upsert one id twice
+        for statement in conn.statements:
+            self.assertLessEqual(statement.count(pages[0][0]['id']), 1)
+        self.assertIn("'first'", script)
+        self.assertGreater(script.rindex("'edited'"), script.rindex("'new'"))
+        self.assertLess(script.index("'first'"), script.index("'edited'"))
+        self.assertEqual(state['expense_log'], {'column': 'created_at', 'value': '2024-01-03T00:00:00+00:00',
+                                                'id': pages[1][1]['id']})
+
+    def test_no_rewrites_without_repeats(self):
+        pages = [[row(1, '2024-01-01T00:00:00+00:00', 'only')]]
+        ok, conn = self.sync(pages, {})
+        self.assertTrue(ok)
+        self.assertEqual(sum("'only'" in statement for statement in conn.statements), 1)
+
+    def test_nothing_changed(self):
+        state = {'expense_log': {'column': 'created_at', 'value': '2024-01-01T00:00:00+00:00',
+                                 'id': row(1, '', '')['id']}}
+        ok, conn = self.sync([], state)
+        self.assertTrue(ok)
+        self.assertEqual(conn.statements, [])
+        self.assertEqual(state['expense_log']['value'], '2024-01-01T00:00:00+00:00')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Replication Coalescing Test
+Checks that coalesce_changes keeps only the last logged operation of every
+record in a page of activity_log entries
+
+Needs no database.
+
+    python migration/test_replicate.py
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import benchmark
+
+SALE = '00000000-0000-0000-0000-0000000000a1'
+OTHER_SALE = '00000000-0000-0000-0000-0000000000a2'
+
+def entry(action, record_id, table='sales_log', **row):
+    return {'table_name': table, 'action': action, 'record_id': record_id,
+            'new_data': None if action == 'DELETE' else {'id': record_id, **row}}
+
+class CoalesceChangesTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        with benchmark.bench_workspace():
+            cls.api = benchmark.load_migrate_api()
+
+    def coalesce(self, entries):
+        return self.api.coalesce_changes(entries, ['sales_log', 'expense_log'])
+
+    def test_updates_become_one_upsert_of_the_latest_row(self):
+        changes, skipped = self.coalesce([
+            entry('INSERT', SALE, customer_name='Ravi'),
+            entry('UPDATE', SALE, customer_name='Ravi K'),
+            entry('UPDATE', SALE, customer_name='Ravi Kumar'),
+        ])
+        self.assertEqual(changes, {'sales_log': ([{'id': SALE, 'customer_name': 'Ravi Kumar'}], [])})
+        self.assertEqual(skipped, 0)
+
+    def test_insert_then_delete_becomes_a_delete(self):
+        changes, _ = self.coalesce([
+            entry('INSERT', SALE, customer_name='Ravi'),
+            entry('UPDATE', SALE, customer_name='Ravi K'),
+            entry('DELETE', SALE),
+        ])
+        self.assertEqual(changes, {'sales_log': ([], [SALE])})
+
+    def test_delete_then_insert_becomes_an_upsert(self):
+        changes, _ = self.coalesce([
+            entry('DELETE', SALE),
+            entry('INSERT', SALE, customer_name='Back'),
+        ])
+        self.assertEqual(changes, {'sales_log': ([{'id': SALE, 'customer_name': 'Back'}], [])})
+
+    def test_records_are_kept_apart_by_table_and_id(self):
+        changes, _ = self.coalesce([
+            entry('INSERT', SALE, customer_name='Ravi'),
+            entry('INSERT', OTHER_SALE, customer_name='Anu'),
+            entry('DELETE', SALE, table='expense_log'),
+        ])
+        self.assertEqual(changes['sales_log'][0], [{'id': SALE, 'customer_name': 'Ravi'},
+                                                   {'id': OTHER_SALE, 'customer_name': 'Anu'}])
+        self.assertEqual(changes['expense_log'], ([], [SALE]))
+
+    def test_unusable_entries_are_skipped(self):
+        changes, skipped = self.coalesce([
+            entry('INSERT', SALE, table='daily_rates', rate=1),
+            entry('INSERT', None, customer_name='No id'),
+            {'table_name': 'sales_log', 'action': 'UPDATE', 'record_id': SALE, 'new_data': None},
+        ])
+        self.assertEqual(changes, {})
+        self.assertEqual(skipped, 3)
+
+    def test_the_record_id_wins_over_the_row_id(self):
+        changes, _ = self.coalesce([{'table_name': 'sales_log', 'action': 'UPDATE', 'record_id': SALE,
+                                     'new_data': {'id': OTHER_SALE, 'customer_name': 'Ravi'}}])
+        self.assertEqual(changes['sales_log'][0], [{'id': SALE, 'customer_name': 'Ravi'}])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+SQL Loader Test
+Checks that export files split into the same statements however the reads
+fall, and that single-row INSERTs split into prefix, tuple and suffix
+
+Needs no database.
+
+    python migration/test_sql_loader.py
+"""
+
+import io
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sql_loader import iter_statements, split_insert
+
+STATEMENTS = [
+    "INSERT INTO sales_log (id, item_name) VALUES ('a1', 'Ring; 22K')",
+    "INSERT INTO sales_log (id, item_name) VALUES ('a2', 'O''Brien''s chain;')",
+    "INSERT INTO sales_log (id, item_name) VALUES ('a3', E'tab\\t and \\' quote;')",
+    "INSERT INTO activity_log (id, new_data) VALUES ('a4', $j${\"note\": \"a;b'c\"}$j$)",
+    'INSERT INTO "odd;table" (id) VALUES (\'a5\')',
+    "INSERT INTO sales_log (id, item_name) VALUES ('a6', 'line one;\nline two')",
+]
+
+SCRIPT = (
+    "-- header comment; not a statement\n"
+    + ";\n".join(STATEMENTS[:3])
+    + ";\n/* block; /* nested; */ comment */\n"
+    + ";\n".join(STATEMENTS[3:])
+    + ";\n"
+)
+
+class IterStatementsTest(unittest.TestCase):
+
+    def test_every_chunk_size_gives_the_same_statements(self):
+        for chunk_size in range(1, len(SCRIPT) + 2):
+            with self.subTest(chunk_size=chunk_size):
+                statements = list(iter_statements(io.StringIO(SCRIPT), chunk_size))
+                self.assertEqual(statements, STATEMENTS)
+
+    def test_last_statement_without_semicolon(self):
+        self.assertEqual(list(iter_statements(io.StringIO("SELECT 1;\nSELECT ';'"), 4)),
+                         ["SELECT 1", "SELECT ';'"])
+
+class SplitInsertTest(unittest.TestCase):
+
+    def test_values_with_parentheses_and_quotes(self):
+        statement = ("INSERT INTO sales_log (id, item_name) VALUES ('a1', 'Ring (22K); O''Brien')"
+                     " ON CONFLICT (id) DO NOTHING")
+        self.assertEqual(split_insert(statement), (
+            "INSERT INTO sales_log (id, item_name) VALUES ",
+            "('a1', 'Ring (22K); O''Brien')",
+            " ON CONFLICT (id) DO NOTHING",
+        ))
+
+    def test_nested_parentheses(self):
+        prefix, values, suffix = split_insert("INSERT INTO t (a, b) VALUES (lower('X)'), ('1')::int)")
+        self.assertEqual(values, "(lower('X)'), ('1')::int)")
+        self.assertEqual(suffix, '')
+
+    def test_other_statements(self):
+        self.assertIsNone(split_insert("DELETE FROM sales_log WHERE id = 'a1'"))
+        self.assertIsNone(split_insert("INSERT INTO t (a) VALUES ('unterminated)"))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Verify Time Zone Test
+Runs verify-data.py --checksum over two tables against a session whose
+default time zone is not UTC, checking timestamps still compare equal
+
+Needs a scratch PostgreSQL database given by BENCH_DSN, like the load
+benchmarks; the test is skipped when it cannot connect.
+
+    BENCH_DSN="host=localhost port=5432 dbname=karat_bench user=postgres" \
+        python migration/test_verify_timezone.py
+"""
+
+import os
+import sys
+import subprocess
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import benchmark
+from mock_postgrest import MockPostgREST
+
+TABLES = ['tz_check_a', 'tz_check_b']
+VERIFY = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'verify-data.py')
+
+ROWS = [{'id': f'00000000-0000-0000-0000-{i:012d}', 'asof_date': f'2024-0{i % 3 + 1}-05',
+         'created_at': f'2024-0{i % 3 + 1}-05T{i % 24:02d}:15:00+00:00'} for i in range(30)]
+
+class VerifyTimeZoneTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        try:
+            import psycopg2
+            cls.conn = psycopg2.connect(benchmark.BENCH_DSN, connect_timeout=5)
+        except Exception as e:
+            raise unittest.SkipTest(f"no benchmark database ({e})")
+        cls.conn.autocommit = True
+        cls.dsn = cls.conn.get_dsn_parameters()
+        with cls.conn.cursor() as cursor:
+            for table in TABLES:
+                cursor.execute(f"DROP TABLE IF EXISTS {table}")
+                cursor.execute(f"CREATE TABLE {table} (id uuid PRIMARY KEY, asof_date date, created_at timestamptz)")
+                for row in ROWS:
+                    cursor.execute(f"INSERT INTO {table} VALUES (%(id)s, %(asof_date)s, %(created_at)s)", row)
+
+    @classmethod
+    def tearDownClass(cls):
+        with cls.conn.cursor() as cursor:
+            for table in TABLES:
+                cursor.execute(f"DROP TABLE IF EXISTS {table}")
+        cls.conn.close()
+
+    def test_checksums_match_in_a_non_utc_session(self):
+        with MockPostgREST({table: ROWS for table in TABLES}) as mock:
+            config = {
+                'SOURCE_URL': mock.url,
+                'TARGET_HOST': self.dsn.get('host', 'localhost'),
+                'TARGET_PORT': self.dsn.get('port', '5432'),
+                'TARGET_DB_NAME': self.dsn['dbname'],
+                'TARGET_USER': self.dsn.get('user', 'postgres'),
+                'TARGET_PASSWORD': os.environ.get('PGPASSWORD', ''),
+                'TABLES': ','.join(TABLES),
+            }
+            with benchmark.bench_workspace(config):
+                # libpq starts the session in PGTZ, as a server set to that zone would
+                result = subprocess.run([sys.executable, VERIFY, '--checksum'], capture_output=True, text=True,
+                                        env={**os.environ, 'PGTZ': 'Asia/Kolkata'})
+        self.assertNotIn('MISMATCH', result.stdout)
+        self.assertIn('All tables match', result.stdout)
+
+if __name__ == '__main__':
+    unittest.main()